@@ -0,0 +1,136 @@
+"""
+kana_to_cells のベンチマーク
+
+変換表 (最長一致) 版の BrailleConverter.kana_to_cells と、以前の1文字ずつの
+ループ (reference_kana_to_cells) を長い読み (小説1冊程度) で比べる。
+出力が同じであることも確認する。
+
+    python benchmarks/bench_kana_to_cells.py [文字数]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from braille_logic import (  # noqa: E402
+    BRAILLE_MAP, SPECIAL_KANA_RULES, SPACE_MARK, NUM_INDICATOR, FOREIGN_INDICATOR,
+    DAKUTEN_MARK, HANDAKUTEN_MARK, YOON_MARK, YOON_DAKU_MARK, YOON_HANDAKU_MARK,
+    BrailleConverter,
+)
+
+DEFAULT_LENGTH = 500000
+
+
+def reference_kana_to_cells(text):
+    """以前の実装 (1文字毎に規則を引き直す)"""
+    cells = bytearray()
+    chars = []
+    if text is None or text == "":
+        return bytes(cells), tuple(chars)
+    if text.strip() == "":
+        for _ in text:
+            cells.append(SPACE_MARK)
+            chars.append(' ')
+        return bytes(cells), tuple(chars)
+
+    marks = {
+        'DAKU': (DAKUTEN_MARK, "゛"), 'HANDAKU': (HANDAKUTEN_MARK, "゜"), 'YOON': (YOON_MARK, "拗"),
+        'YOON_DAKU': (YOON_DAKU_MARK, "拗゛"), 'YOON_HANDAKU': (YOON_HANDAKU_MARK, "拗゜"),
+    }
+    mode = "kana"
+    i = 0
+    while i < len(text):
+        char = text[i]
+        pair_char = text[i:i+2]
+        rule_key = None
+        if len(pair_char) == 2 and pair_char in SPECIAL_KANA_RULES:
+            rule_key = pair_char
+        elif char in SPECIAL_KANA_RULES:
+            rule_key = char
+        if rule_key is not None:
+            rule, base_char = SPECIAL_KANA_RULES[rule_key]
+            mark, mark_char = marks.get(rule, (SPACE_MARK, ""))
+            cells.append(mark)
+            chars.append(mark_char)
+            cells.append(BRAILLE_MAP.get(base_char, SPACE_MARK))
+            chars.append(base_char)
+            i += len(rule_key)
+            continue
+
+        if char.isdigit():
+            if mode != "number":
+                cells.append(NUM_INDICATOR)
+                chars.append('#')
+                mode = "number"
+            cells.append(BRAILLE_MAP.get(char, SPACE_MARK))
+            chars.append(char)
+        elif re.match(r'[a-zA-Z]', char):
+            if mode != "foreign":
+                cells.append(FOREIGN_INDICATOR)
+                chars.append('外')
+                mode = "foreign"
+            cells.append(BRAILLE_MAP.get(char.lower(), SPACE_MARK))
+            chars.append(char)
+        elif char in BRAILLE_MAP:
+            if mode != "kana": mode = "kana"
+            cells.append(BRAILLE_MAP[char])
+            chars.append(char)
+        i += 1
+    return bytes(cells), tuple(chars)
+
+
+def make_reading(length, seed=0):
+    """ひらがな中心に、拗音・濁音・数字・英字・記号を混ぜた読み"""
+    rng = random.Random(seed)
+    kana = [c for c in BRAILLE_MAP if 'ぁ' <= c <= 'ゟ']
+    special = list(SPECIAL_KANA_RULES)
+    parts = []
+    total = 0
+    while total < length:
+        r = rng.random()
+        if r < 0.70:
+            word = rng.choice(kana)
+        elif r < 0.90:
+            word = rng.choice(special)
+        elif r < 0.94:
+            word = str(rng.randint(0, 2025))
+        elif r < 0.96:
+            word = rng.choice(["ABC", "Python", "tenji", "３", "漢"])
+        else:
+            word = rng.choice(["、", "。", "ー", " "])
+        parts.append(word)
+        total += len(word)
+    return "".join(parts)
+
+
+def bench(func, text, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LENGTH
+    text = make_reading(length)
+    # 形態素解析器は使わないので初期化しない
+    converter = BrailleConverter.__new__(BrailleConverter)
+
+    if converter._kana_to_cells(text) != reference_kana_to_cells(text):
+        raise SystemExit("output mismatch")
+
+    old = bench(reference_kana_to_cells, text)
+    new = bench(converter._kana_to_cells, text)
+    print(f"reading: {len(text)} chars")
+    print(f"reference loop : {old * 1000:8.1f} ms")
+    print(f"compiled table : {new * 1000:8.1f} ms  (x{old / new:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+システム辞書の前方一致検索のベンチマーク
+
+FST (janome.fst.Matcher) とダブル配列 (janome.dat.DoubleArrayMatcher) で、
+Tokenizer と同じ問い合わせ (各位置から最大50文字) を比べる。結果が同じであることも確認する。
+ダブル配列は build_sysdic_binary.py で作った double_array.bin を使う。
+
+    python benchmarks/bench_matcher.py [コーパス (UTF-8 テキスト)]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from janome.fst import Matcher  # noqa: E402
+from janome.sysdic import all_fstdata, double_array  # noqa: E402
+from janome.tokenizer import Tokenizer  # noqa: E402
+
+# コーパスを指定しない場合の文章
+SAMPLE_TEXT = (
+    "点字は、指で触れて読む文字です。縦3点、横2列の6つの点の組み合わせで、"
+    "かなや数字、アルファベットを表します。\n"
+    "このアプリでは、入力した日本語を形態素解析して読みに直し、点字に変換します。"
+    "変換した点字は、3Dプリンターで印刷できるSTLファイルとして書き出せます。\n"
+    "東京都の特別支援学校では、2025年から授業で点字の名札を作っています。"
+    "先生は「自分の名前を指で読めると、子どもたちはとても喜びます」と話していました。\n"
+    "漢字の読みは文脈によって変わるため、変換結果を確認し、必要に応じて読みを修正してください。"
+)
+SAMPLE_REPEAT = 50
+
+
+def load_corpus():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            return f.read()
+    return SAMPLE_TEXT * SAMPLE_REPEAT
+
+
+def queries(text):
+    """Tokenizer と同じく、各位置から最大50文字を UTF-8 にしたもの"""
+    return [text[pos:pos + 50].encode("utf-8") for pos in range(len(text)) if not text[pos].isspace()]
+
+
+def bench(func, words, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for w in words:
+            func(w)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_tokenize(tokenizer, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in tokenizer.tokenize(text, wakati=True):
+            pass
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    da = double_array()
+    if da is None:
+        raise SystemExit("double_array.bin not found. run build_sysdic_binary.py first.")
+    text = load_corpus()
+    words = queries(text)
+
+    t0 = time.perf_counter()
+    fst = Matcher(all_fstdata())
+    fst_load = time.perf_counter() - t0
+
+    for w in words:
+        if fst.run(w) != da.run(w):
+            raise SystemExit(f"output mismatch: {w.decode('utf-8')}")
+
+    # FST はキャッシュが温まった状態で測る (Tokenizer と同じく同じインスタンスを使い続ける)
+    fst_time = bench(fst.run, words)
+    da_run = bench(da.run, words)
+    da_ids = bench(da.morph_ids, words)
+    n = len(words)
+    print(f"corpus: {len(text)} chars, {n} queries")
+    print(f"FST load          : {fst_load * 1000:8.1f} ms")
+    print(f"FST Matcher.run   : {fst_time * 1e6 / n:8.1f} us/query")
+    print(f"double array run  : {da_run * 1e6 / n:8.1f} us/query  (x{fst_time / da_run:.1f})")
+    print(f"double array ids  : {da_ids * 1e6 / n:8.1f} us/query  (x{fst_time / da_ids:.1f})")
+
+    tokenizer = Tokenizer()
+    tokenizer.matcher = fst
+    tok_fst = bench_tokenize(tokenizer, text)
+    tokenizer.matcher = da
+    tok_da = bench_tokenize(tokenizer, text)
+    print(f"tokenize (FST)    : {tok_fst * 1000:8.1f} ms")
+    print(f"tokenize (double) : {tok_da * 1000:8.1f} ms  (x{tok_fst / tok_da:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,46 @@
-import re
+import os
+import logging
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# 点字セルは6ビットの整数 (1の点=bit0 ... 6の点=bit5) で扱う。
+# 単語・文書のようなセルの並びは bytes / bytearray (1セル1バイト) で持つ。
+
+
+def dots_to_cell(dots):
+    """6点の並び [1,0,0,0,0,0] -> セル (6ビット整数)"""
+    cell = 0
+    for i, is_on in enumerate(dots):
+        if is_on:
+            cell |= 1 << i
+    return cell
+
+
+def cell_to_dots(cell):
+    """セル (6ビット整数) -> 6点の並び"""
+    return [(cell >> i) & 1 for i in range(6)]
+
 
 # 特殊符定義
-DAKUTEN_MARK      = [0,0,0,0,1,0] # 5の点
-HANDAKUTEN_MARK   = [0,0,0,0,0,1] # 6の点
-YOON_MARK         = [0,0,0,1,0,0] # 4の点
-YOON_DAKU_MARK    = [0,0,0,1,1,0] # 4,5の点
-YOON_HANDAKU_MARK = [0,0,0,1,0,1] # 4,6の点
-NUM_INDICATOR     = [0,0,1,1,1,1] # 数符
-FOREIGN_INDICATOR = [0,0,0,0,1,1] # 外字符
-SPACE_MARK        = [0,0,0,0,0,0] # スペース
-
-# 基本点字マッピング
-BRAILLE_MAP = {
+DAKUTEN_MARK      = dots_to_cell([0,0,0,0,1,0]) # 5の点
+HANDAKUTEN_MARK   = dots_to_cell([0,0,0,0,0,1]) # 6の点
+YOON_MARK         = dots_to_cell([0,0,0,1,0,0]) # 4の点
+YOON_DAKU_MARK    = dots_to_cell([0,0,0,1,1,0]) # 4,5の点
+YOON_HANDAKU_MARK = dots_to_cell([0,0,0,1,0,1]) # 4,6の点
+NUM_INDICATOR     = dots_to_cell([0,0,1,1,1,1]) # 数符
+FOREIGN_INDICATOR = dots_to_cell([0,0,0,0,1,1]) # 外字符
+SPACE_MARK        = dots_to_cell([0,0,0,0,0,0]) # スペース
+
+# 次のセルと組で扱う (行の途中で分けない) 前置符
+PREFIX_MARKS = frozenset([
+    DAKUTEN_MARK, HANDAKUTEN_MARK, YOON_MARK, YOON_DAKU_MARK, YOON_HANDAKU_MARK, NUM_INDICATOR, FOREIGN_INDICATOR
+])
+
+# 基本点字マッピング (表は点の並びで書き、セルの整数に変換して使う)
+_BRAILLE_DOTS = {
     '1': [1,0,0,0,0,0], '2': [1,1,0,0,0,0], '3': [1,0,0,1,0,0], '4': [1,0,0,1,1,0], '5': [1,0,0,0,1,0],
     '6': [1,1,0,1,0,0], '7': [1,1,0,1,1,0], '8': [1,1,0,0,1,0], '9': [0,1,0,1,0,0], '0': [0,1,0,1,1,0],
     'a': [1,0,0,0,0,0], 'b': [1,1,0,0,0,0], 'c': [1,0,0,1,0,0], 'd': [1,0,0,1,1,0], 'e': [1,0,0,0,1,0],
@@ -31,6 +60,7 @@ BRAILLE_MAP = {
     'わ': [0,0,1,0,0,0], 'を': [0,0,1,1,1,0], 'ん': [0,0,1,0,1,1],
     'っ': [0,1,0,0,0,0], 'ー': [0,1,0,0,1,0], '、': [0,0,0,0,1,0], '。': [0,1,0,0,1,1], ' ': [0,0,0,0,0,0], 
 }
+BRAILLE_MAP = {char: dots_to_cell(dots) for char, dots in _BRAILLE_DOTS.items()}
 
 SPECIAL_KANA_RULES = {
     'が': ('DAKU', 'か'), 'ぎ': ('DAKU', 'き'), 'ぐ': ('DAKU', 'く'), 'げ': ('DAKU', 'け'), 'ご': ('DAKU', 'こ'),
@@ -52,6 +82,109 @@ SPECIAL_KANA_RULES = {
     'ぴゃ': ('YOON_HANDAKU', 'は'), 'ぴゅ': ('YOON_HANDAKU', 'ふ'), 'ぴょ': ('YOON_HANDAKU', 'ほ'),
 }
 
+# 特殊符 (SPECIAL_KANA_RULES の規則) -> (前置符, 表示用文字)
+_SPECIAL_MARKS = {
+    'DAKU': (DAKUTEN_MARK, "゛"),
+    'HANDAKU': (HANDAKUTEN_MARK, "゜"),
+    'YOON': (YOON_MARK, "拗"),
+    'YOON_DAKU': (YOON_DAKU_MARK, "拗゛"),
+    'YOON_HANDAKU': (YOON_HANDAKU_MARK, "拗゜"),
+}
+
+# kana_to_cells のモード (数符・外字符を付けるかどうかの状態)
+MODE_KANA = 0
+MODE_NUMBER = 1
+MODE_FOREIGN = 2
+
+# モードに入るときに付ける前置符
+_MODE_INDICATORS = {
+    MODE_NUMBER: (NUM_INDICATOR, '#'),
+    MODE_FOREIGN: (FOREIGN_INDICATOR, '外'),
+}
+
+# BRAILLE_MAP にない数字 (全角数字など) の表のキー
+_UNKNOWN_DIGIT = '\0digit'
+
+
+def _compile_kana_tables():
+    """
+    BRAILLE_MAP と SPECIAL_KANA_RULES から kana_to_cells の変換表を作る。
+    モード毎に {読みの1〜2文字: (セル bytes, 表示用文字のタプル, 次のモード)} で、
+    数符・外字符はモードが変わるところのエントリに含めておく。
+    """
+    # 読み -> (セル, 表示用文字, そのトークンのモード (None ならモードを変えない))
+    tokens = {}
+    for char, cell in BRAILLE_MAP.items():
+        if char.isdigit():
+            tokens[char] = ((cell,), (char,), MODE_NUMBER)
+        elif 'a' <= char <= 'z':
+            tokens[char] = ((cell,), (char,), MODE_FOREIGN)
+            tokens[char.upper()] = ((cell,), (char.upper(),), MODE_FOREIGN)
+        else:
+            tokens[char] = ((cell,), (char,), MODE_KANA)
+    tokens[_UNKNOWN_DIGIT] = ((SPACE_MARK,), ('',), MODE_NUMBER)
+    for key, (rule, base_char) in SPECIAL_KANA_RULES.items():
+        mark, mark_char = _SPECIAL_MARKS.get(rule, (SPACE_MARK, ""))
+        tokens[key] = ((mark, BRAILLE_MAP.get(base_char, SPACE_MARK)), (mark_char, base_char), None)
+
+    tables = []
+    for mode in (MODE_KANA, MODE_NUMBER, MODE_FOREIGN):
+        table = {}
+        for key, (cells, chars, token_mode) in tokens.items():
+            next_mode = mode if token_mode is None else token_mode
+            if next_mode != mode and next_mode in _MODE_INDICATORS:
+                indicator, indicator_char = _MODE_INDICATORS[next_mode]
+                cells = (indicator,) + cells
+                chars = (indicator_char,) + chars
+            table[key] = (bytes(cells), chars, next_mode)
+        tables.append(table)
+    return tables
+
+
+_KANA_TABLES = _compile_kana_tables()
+# 2文字のエントリ (拗音など) の1文字目。これ以外は2文字を切り出さない
+_PAIR_HEADS = frozenset(key[0] for key in SPECIAL_KANA_RULES if len(key) == 2)
+
+
+# 1行分のセル (bytes) と、各セルの表示用の文字
+CellLine = namedtuple('CellLine', ['cells', 'chars'])
+
+
+def cells_to_legacy(cells, chars):
+    """セル列 -> 旧形式 [{'dots': [...], 'char': ...}] (履歴の保存用)"""
+    return [{'dots': cell_to_dots(cell), 'char': char} for cell, char in zip(cells, chars)]
+
+
+def cells_from_legacy(cell_dicts):
+    """旧形式 [{'dots': [...], 'char': ...}] -> (セル列 bytes, 文字のタプル)"""
+    return bytes(dots_to_cell(c['dots']) for c in cell_dicts), tuple(c['char'] for c in cell_dicts)
+
+
+def mapped_data_to_legacy(mapped_data):
+    """変換結果 (単語毎) を JSON に保存できる旧形式へ"""
+    legacy = []
+    for item in mapped_data:
+        entry = {k: v for k, v in item.items() if k not in ('cells', 'chars')}
+        entry['cells'] = cells_to_legacy(item['cells'], item['chars'])
+        entry['braille'] = [c['dots'] for c in entry['cells']]
+        legacy.append(entry)
+    return legacy
+
+
+def mapped_data_from_legacy(mapped_data):
+    """旧形式 (履歴に保存されたもの) の変換結果を現在の形式へ。現在の形式ならそのまま"""
+    items = []
+    for item in mapped_data:
+        cells = item.get('cells', b'')
+        if isinstance(cells, (bytes, bytearray)):
+            items.append(item)
+            continue
+        entry = {k: v for k, v in item.items() if k not in ('cells', 'braille')}
+        entry['cells'], entry['chars'] = cells_from_legacy(cells)
+        items.append(entry)
+    return items
+
+
 # 安全なインポート処理
 try:
     from janome.tokenizer import Tokenizer
@@ -60,23 +193,114 @@ except ImportError:
     JANOME_AVAILABLE = False
     Tokenizer = None
 
+# convert_many で1回にワーカーへ送るテキスト数
+CONVERT_MANY_CHUNKSIZE = 64
+
+# convert_many のワーカープロセス毎の変換器 (initializer で1つだけ作り、辞書を使い回す)
+_worker_converter = None
+
+
+def _init_convert_worker(cache_size):
+    global _worker_converter
+    _worker_converter = BrailleConverter(cache_size=cache_size)
+
+
+def _convert_chunk_worker(texts):
+    """ProcessPoolExecutor 用 (トップレベル関数である必要がある)"""
+    return [_worker_converter.convert_with_mapping(text) for text in texts]
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# 差分変換 (convert_incremental) で解析し直す単位の、文の区切り
+SENTENCE_DELIMITERS = '。！？\n'
+
+# 読み -> セル列 のキャッシュ (BrailleConverter) の件数
+READING_CACHE_SIZE = 4096
+
 class BrailleConverter:
-    def __init__(self):
+    def __init__(self, cache_size=READING_CACHE_SIZE, background_load=False):
+        """
+        background_load: True なら辞書 (Janome) をバックグラウンドのスレッドで読み込む。
+            読み込み中 (is_loading) は _fallback_convert で変換する。
+            読み込みが終わったら add_ready_callback() で登録した関数を呼ぶ。
+        """
         self.use_kakasi = False # UI互換用変数
         self.tokenizer = None
         self.error_msg = ""
+
+        # 助詞・よく出る名詞・数字などは同じ読みが何度も変換されるので LRU で覚えておく
+        # 値は (bytes, tuple) で変更できないので、そのまま共有して返す
+        self.cache_size = cache_size
+        self._reading_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # 辞書の読み込み状態 (tokenizer_ready_at は time.perf_counter() の値)
+        self.tokenizer_ready = threading.Event()
+        self.tokenizer_load_seconds = None
+        self.tokenizer_ready_at = None
+        self._ready_lock = threading.Lock()
+        self._ready_callbacks = []
         
-        if JANOME_AVAILABLE:
+        if not JANOME_AVAILABLE:
+            self.error_msg = "Module 'janome' not found"
+            self._set_tokenizer_ready()
+        elif background_load:
+            threading.Thread(target=self._load_tokenizer, name="janome-warmup", daemon=True).start()
+        else:
+            self._load_tokenizer()
+
+    @property
+    def is_loading(self):
+        """辞書の読み込み中か (この間はフォールバック変換)"""
+        return not self.tokenizer_ready.is_set()
+
+    def add_ready_callback(self, callback):
+        """辞書の読み込みが終わったら callback() を呼ぶ (終わっていればすぐ呼ぶ)"""
+        with self._ready_lock:
+            if not self.tokenizer_ready.is_set():
+                self._ready_callbacks.append(callback)
+                return
+        callback()
+
+    def _load_tokenizer(self):
+        t0 = time.perf_counter()
+        try:
+            self.tokenizer = Tokenizer()
+            self.use_kakasi = True
+        except Exception as e:
+            self.error_msg = str(e)
+            print(f"Janome Init Error: {e}")
+        self.tokenizer_load_seconds = time.perf_counter() - t0
+        logging.info(f"Tokenizer loaded in {self.tokenizer_load_seconds * 1000:.0f} ms")
+        self._set_tokenizer_ready()
+
+    def _set_tokenizer_ready(self):
+        with self._ready_lock:
+            self.tokenizer_ready_at = time.perf_counter()
+            self.tokenizer_ready.set()
+            callbacks, self._ready_callbacks = self._ready_callbacks, []
+        for callback in callbacks:
             try:
-                self.tokenizer = Tokenizer()
-                self.use_kakasi = True
+                callback()
             except Exception as e:
-                self.error_msg = str(e)
-                print(f"Janome Init Error: {e}")
-        else:
-            self.error_msg = "Module 'janome' not found"
+                logging.error(f"Tokenizer Ready Callback Error: {e}")
 
-    def convert_with_mapping(self, text):
+    def convert_with_mapping(self, text, at_start=True, at_end=True):
+        """
+        text を単語毎の読み・点字にする。単語の start / end は text を隙間なく覆う。
+        at_start / at_end: text が文書の先頭から始まる・末尾で終わるか (差分変換で文書の途中を変換するときは False)。
+        文書の先頭・末尾の空白は Janome が取り除くので、点字のセルを持たない単語にする。
+        """
         result_data = []
         current_index = 0
         if not text: return []
@@ -87,6 +311,12 @@ class BrailleConverter:
                 tokens = self.tokenizer.tokenize(text)
                 for token in tokens:
                     orig_word = token.surface
+                    # Janome は文頭・文末の空白を返さないので、飛ばされた部分も単語として入れる
+                    # (start / end を本文の位置と一致させる。convert_incremental が前提にしている)
+                    word_start = text.find(orig_word, current_index)
+                    if word_start > current_index:
+                        result_data.append(self._gap_item(text, current_index, word_start, blank=at_start and current_index == 0))
+                        current_index = word_start
                     # 読み(カタカナ)を取得
                     reading_kata = token.reading if token.reading != '*' else token.surface
                     # カタカナ -> ひらがな変換
@@ -97,18 +327,18 @@ class BrailleConverter:
                     end = current_index + word_len
                     current_index += word_len
 
-                    cells = self.kana_to_cells(reading)
-                    
-                    dots_only = [c['dots'] for c in cells]
+                    cells, chars = self.kana_to_cells(reading)
 
                     result_data.append({
                         'orig': orig_word,
                         'reading': reading,
-                        'braille': dots_only,
                         'cells': cells,
+                        'chars': chars,
                         'start': start,
                         'end': end
                     })
+                if current_index < len(text):
+                    result_data.append(self._gap_item(text, current_index, len(text), blank=at_end))
             except Exception as e:
                 print(f"Tokenize Error: {e}")
                 result_data = self._fallback_convert(text)
@@ -117,17 +347,131 @@ class BrailleConverter:
 
         return result_data
 
+    def convert_many(self, texts, workers=None, chunksize=CONVERT_MANY_CHUNKSIZE):
+        """
+        多数のテキスト (ラベル等) をまとめて変換するジェネレータ。
+        入力順に convert_with_mapping と同じ結果を1件ずつ返す (全件の完了を待たずに使える)。
+        workers: ワーカープロセス数 (None ならCPU数, 1 ならこのプロセスで変換)
+        chunksize: 1回でワーカーに送るテキスト数
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1:
+            for text in texts:
+                yield self.convert_with_mapping(text)
+            return
+
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_convert_worker, initargs=(self.cache_size,))
+        # 先行して投げておくチャンク数を制限し、入力が大きくても少しずつ読んで返す
+        pending = deque()
+        try:
+            for chunk in _chunks(texts, chunksize):
+                pending.append(executor.submit(_convert_chunk_worker, chunk))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown()
+
+    def convert_incremental(self, old_text, new_text, old_mapped_data):
+        """
+        old_text を new_text に編集したときの変換結果を、変わった文だけ解析し直して作る。
+        old_mapped_data は old_text の変換結果。変わった範囲を含む文 (。！？ と改行で区切る)
+        以外の単語はそのまま使う (手で直した読みも残る) ので、start / end だけずらす。
+        """
+        if (not old_text or not new_text or not old_mapped_data
+                or old_mapped_data[0]['start'] != 0 or old_mapped_data[-1]['end'] != len(old_text)):
+            return self.convert_with_mapping(new_text)
+        if old_text == new_text:
+            return list(old_mapped_data)
+
+        old_len = len(old_text)
+        new_len = len(new_text)
+        limit = min(old_len, new_len)
+        prefix = 0
+        while prefix < limit and old_text[prefix] == new_text[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old_text[old_len - 1 - suffix] == new_text[new_len - 1 - suffix]:
+            suffix += 1
+        delta = new_len - old_len
+
+        # 変わった範囲を文の区切りまで広げる (前は共通の先頭部分, 後ろは共通の末尾部分で探す)
+        start = max(new_text.rfind(d, 0, prefix) for d in SENTENCE_DELIMITERS) + 1
+        search_from = max(prefix, new_len - suffix - 1)
+        ends = [i for i in (new_text.find(d, search_from) for d in SENTENCE_DELIMITERS) if i != -1]
+        end = min(ends) + 1 if ends else new_len
+
+        # 区切りをまたぐ単語があれば、その単語の境界まで広げる
+        old_end = end - delta
+        n = len(old_mapped_data)
+        i = 0
+        while i < n and old_mapped_data[i]['end'] <= start:
+            i += 1
+        if i < n:
+            start = min(start, old_mapped_data[i]['start'])
+        j = i
+        while j < n and old_mapped_data[j]['start'] < old_end:
+            j += 1
+        if j > i:
+            old_end = max(old_end, old_mapped_data[j - 1]['end'])
+        end = old_end + delta
+
+        middle = []
+        for item in self.convert_with_mapping(new_text[start:end], at_start=start == 0, at_end=end == new_len):
+            item['start'] += start
+            item['end'] += start
+            middle.append(item)
+        after = [dict(item, start=item['start'] + delta, end=item['end'] + delta) for item in old_mapped_data[j:]]
+        return old_mapped_data[:i] + middle + after
+
+    def normalize_mapped_data(self, text, mapped_data):
+        """
+        変換結果の start / end を text の位置に合わせ、単語の無い部分 (空白) を単語として入れる。
+        以前の版の変換結果 (履歴に保存されたもの) は Janome が飛ばした空白を含まず本文を覆わないので、
+        そのままだと最初の編集で convert_incremental が全文を変換し直し、手で直した読みが消える。
+        単語が text の中に見つからなければ mapped_data をそのまま返す。
+        """
+        items = []
+        pos = 0
+        for item in mapped_data:
+            start = text.find(item['orig'], pos)
+            if start == -1:
+                return mapped_data
+            if start > pos:
+                items.append(self._gap_item(text, pos, start, blank=pos == 0))
+            end = start + len(item['orig'])
+            items.append(dict(item, start=start, end=end))
+            pos = end
+        if pos < len(text):
+            items.append(self._gap_item(text, pos, len(text), blank=True))
+        return items
+
+    def _gap_item(self, text, start, end, blank=False):
+        """
+        形態素解析で返されなかった部分 (空白) の単語
+        blank: 文書の先頭・末尾の空白 (Janome が取り除く部分) ならセルを持たない
+        """
+        orig = text[start:end]
+        if blank and orig.isspace():
+            cells, chars = b'', ()
+        else:
+            cells, chars = self.kana_to_cells(orig)
+        return {'orig': orig, 'reading': orig, 'cells': cells, 'chars': chars, 'start': start, 'end': end}
+
     def _fallback_convert(self, text):
         """フォールバック（そのままひらがなとして処理）"""
         result_data = []
         current_index = 0
         for char in text:
-            cells = self.kana_to_cells(char)
+            cells, chars = self.kana_to_cells(char)
             result_data.append({
                 'orig': char,
                 'reading': char,
-                'braille': [c['dots'] for c in cells],
                 'cells': cells,
+                'chars': chars,
                 'start': current_index,
                 'end': current_index + 1
             })
@@ -146,76 +490,193 @@ class BrailleConverter:
         return result
 
     def kana_to_cells(self, text):
-        cells = []
-        
+        """読み (ひらがな) -> (セル列 bytes, 各セルの表示用文字のタプル)。同じ読みはキャッシュから返す"""
+        if not self.cache_size:
+            return self._kana_to_cells(text)
+        with self._cache_lock:
+            result = self._reading_cache.get(text)
+            if result is not None:
+                self._reading_cache.move_to_end(text)
+                self.cache_hits += 1
+                return result
+            self.cache_misses += 1
+        result = self._kana_to_cells(text)
+        with self._cache_lock:
+            self._reading_cache[text] = result
+            while len(self._reading_cache) > self.cache_size:
+                self._reading_cache.popitem(last=False)
+        return result
+
+    def cache_info(self):
+        """読みのキャッシュの統計 (件数の調整用)"""
+        with self._cache_lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'hit_rate': self.cache_hits / total if total else 0.0,
+                'size': len(self._reading_cache),
+                'max_size': self.cache_size,
+            }
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._reading_cache.clear()
+            self.cache_hits = 0
+            self.cache_misses = 0
+
+    def _kana_to_cells(self, text):
         # 修正: 空文字またはスペースのみの場合は空のセルリストを返す
         if text is None or text == "":
-            return cells
+            return b'', ()
             
         # スペースのみの場合はスペースのセルを返す
         if text.strip() == "":
-             # スペースの数だけ空白セルを追加
-            for _ in text:
-                cells.append({'dots': SPACE_MARK, 'char': ' '})
-            return cells
+            # スペースの数だけ空白セルを追加
+            return bytes([SPACE_MARK]) * len(text), (' ',) * len(text)
 
-        mode = "kana"
+        # 変換表 (_KANA_TABLES) を最長一致で引くだけの1パス
+        cells = bytearray()
+        chars = []
+        table = _KANA_TABLES[MODE_KANA]
+        pair_heads = _PAIR_HEADS
         i = 0
-        while i < len(text):
+        n = len(text)
+        while i < n:
             char = text[i]
-            pair_char = text[i:i+2]
-            
-            if len(pair_char) == 2 and pair_char in SPECIAL_KANA_RULES:
-                rule, base_char = SPECIAL_KANA_RULES[pair_char]
-                self._add_special_cells(cells, rule, base_char, pair_char)
+            entry = None
+            if char in pair_heads:
+                entry = table.get(text[i:i+2])
+            if entry is not None:
                 i += 2
-                continue
-
-            if char in SPECIAL_KANA_RULES:
-                rule, base_char = SPECIAL_KANA_RULES[char]
-                self._add_special_cells(cells, rule, base_char, char)
-                i += 1
-                continue
-
-            if char.isdigit():
-                if mode != "number":
-                    cells.append({'dots': NUM_INDICATOR, 'char': '#'})
-                    mode = "number"
-                cells.append({'dots': BRAILLE_MAP.get(char, SPACE_MARK), 'char': char})
-            elif re.match(r'[a-zA-Z]', char):
-                if mode != "foreign":
-                    cells.append({'dots': FOREIGN_INDICATOR, 'char': '外'})
-                    mode = "foreign"
-                cells.append({'dots': BRAILLE_MAP.get(char.lower(), SPACE_MARK), 'char': char})
-            elif char in BRAILLE_MAP:
-                if mode != "kana": mode = "kana"
-                # text.strip() == "" チェックで全体の空白は弾かれているが、
-                # ここでは辞書にあるなら追加する方針。
-                cells.append({'dots': BRAILLE_MAP[char], 'char': char})
             else:
-                pass 
-            i += 1
-        return cells
+                i += 1
+                entry = table.get(char)
+                if entry is None:
+                    # 表にない文字: 全角数字などの数字は数のモードで空白セル、他は読み飛ばす
+                    if not char.isdigit():
+                        continue
+                    digit_cells, digit_chars, next_mode = table[_UNKNOWN_DIGIT]
+                    entry = (digit_cells, digit_chars[:-1] + (char,), next_mode)
+            cells += entry[0]
+            chars.extend(entry[1])
+            table = _KANA_TABLES[entry[2]]
+        return bytes(cells), tuple(chars)
 
-    def _add_special_cells(self, cells, rule, base_char, display_char):
-        mark = SPACE_MARK
-        mark_char = ""
-        
-        if rule == 'DAKU': 
-            mark = DAKUTEN_MARK
-            mark_char = "゛"
-        elif rule == 'HANDAKU': 
-            mark = HANDAKUTEN_MARK
-            mark_char = "゜"
-        elif rule == 'YOON': 
-            mark = YOON_MARK
-            mark_char = "拗"
-        elif rule == 'YOON_DAKU': 
-            mark = YOON_DAKU_MARK
-            mark_char = "拗゛"
-        elif rule == 'YOON_HANDAKU': 
-            mark = YOON_HANDAKU_MARK
-            mark_char = "拗゜"
-        
-        cells.append({'dots': mark, 'char': mark_char})
-        cells.append({'dots': BRAILLE_MAP.get(base_char, SPACE_MARK), 'char': base_char})
\ No newline at end of file
+
+# 入力が止まってから変換を始めるまでの待ち時間 (秒)
+CONVERSION_DEBOUNCE = 0.15
+
+
+class ConversionWorker:
+    """
+    入力のたびの変換をバックグラウンドのスレッドで行う。
+    submit() のあと debounce 秒新しい入力がなければ変換し、on_result(generation, text, mapped_data) を呼ぶ。
+    新しい submit() / cancel() があると、待ち中・変換中の古い依頼の結果は捨てる (最新の結果だけ渡す)。
+    on_result はこのスレッドから呼ばれる。wait() で依頼が片付く (結果を渡す・捨てる) まで待てる。
+    """
+
+    def __init__(self, converter, on_result, debounce=CONVERSION_DEBOUNCE):
+        self.converter = converter
+        self.on_result = on_result
+        self.debounce = debounce
+        self._cond = threading.Condition()
+        self._job = None
+        self._generation = 0
+        # 片付いた依頼の番号の最大値 (これ以前の依頼は結果を渡したか捨てた)
+        self._finished = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="braille-conversion", daemon=True)
+        self._thread.start()
+
+    def submit(self, text, base_text="", base_mapped_data=(), immediate=False):
+        """
+        text の変換を依頼する。base_text / base_mapped_data は前回の変換結果 (差分変換の元)。
+        immediate なら debounce を待たない。依頼の番号 (generation) を返す。
+        base_mapped_data の単語は複製して持つので、呼び出し側が後で書き換えても変換には影響しない。
+        """
+        base_mapped_data = [dict(item) for item in base_mapped_data]
+        with self._cond:
+            self._generation += 1
+            submitted = time.perf_counter()
+            due = submitted if immediate else submitted + self.debounce
+            self._job = (self._generation, submitted, due, text, base_text, base_mapped_data)
+            self._cond.notify_all()
+            return self._generation
+
+    def cancel(self):
+        """待ち中・変換中の依頼の結果を捨てる"""
+        with self._cond:
+            self._generation += 1
+            self._job = None
+            self._finished = self._generation
+            self._cond.notify_all()
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def wait(self, generation, timeout=None):
+        """
+        generation 番の依頼が片付くまで待つ (on_result を呼び終えたか、新しい依頼で捨てられた)。
+        時間切れなら False。on_result の中から呼ぶと終わらないので、呼ばないこと。
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._finished >= generation or self._closed, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._job = None
+            self._cond.notify_all()
+
+    def _next_job(self):
+        """debounce が過ぎた最新の依頼を取り出す (閉じられたら None)"""
+        with self._cond:
+            while not self._closed:
+                if self._job is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._job[2] - time.perf_counter()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                job = self._job
+                self._job = None
+                return job
+            return None
+
+    def _finish(self, generation):
+        with self._cond:
+            self._finished = max(self._finished, generation)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._process(job)
+            finally:
+                self._finish(job[0])
+
+    def _process(self, job):
+        generation, submitted, _, text, base_text, base_mapped_data = job
+        t_start = time.perf_counter()
+        try:
+            mapped_data = self.converter.convert_incremental(base_text, text, base_mapped_data)
+        except Exception as e:
+            logging.error(f"Conversion Error: {e}")
+            return
+        t_converted = time.perf_counter()
+        if not self.is_current(generation):
+            logging.debug(f"Conversion #{generation}: superseded, result dropped ({(t_converted - t_start) * 1000:.1f} ms)")
+            return
+        try:
+            self.on_result(generation, text, mapped_data)
+        except Exception as e:
+            logging.error(f"Conversion Apply Error: {e}")
+            return
+        t_applied = time.perf_counter()
+        logging.info(f"Conversion #{generation}: {len(text)} chars, wait {(t_start - submitted) * 1000:.0f} ms, "
+                     f"convert {(t_converted - t_start) * 1000:.1f} ms, apply {(t_applied - t_converted) * 1000:.1f} ms")
@@ -36,5 +36,13 @@ echo "[3/3] アプリのビルドを開始します..."
 # flutter doctorで認識されているか確認（念のため）
 flutter doctor -v | grep "CocoaPods"
 
+# 辞書のバイナリ (connections.bin / entries.bin / double_array.bin) を作ってアプリに同梱する
+# (無いと起動・変換が遅い .py の辞書を使う)
+if [ -d "janome/sysdic" ]; then
+    python3 build_sysdic_binary.py janome/sysdic || exit 1
+else
+    echo "janome/sysdic が見つかりません。辞書のバイナリは作られません。"
+fi
+
 # ビルド
 flet build macos --product "Tenji P-Fab" --org "com.yourname.tenjipfab"
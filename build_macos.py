@@ -14,6 +14,15 @@ def run_command(command, cwd=None, ignore_error=False):
         return False
     return True
 
+def build_sysdic_binary():
+    """Janome のシステム辞書を mmap で読めるバイナリ (connections.bin / entries.bin / double_array.bin) にする"""
+    sysdic_dir = os.path.join("janome", "sysdic")
+    if not os.path.isdir(sysdic_dir):
+        print(f"⚠️ {sysdic_dir} not found. Dictionary binaries are not built (the app falls back to the .py dictionary).")
+        return
+    print("Building Janome dictionary binaries...")
+    run_command(f'"{sys.executable}" build_sysdic_binary.py "{sysdic_dir}"')
+
 def main():
     print("🚀 Starting macOS Build Process...")
 
@@ -45,6 +54,9 @@ def main():
             print("Cleaning build directory...")
             run_command("rm -rf build")
 
+        # 辞書のバイナリはアプリに同梱する (無いと起動・変換が遅い .py の辞書を使う)
+        build_sysdic_binary()
+
         # 2. Fletによるベースプロジェクトの生成
         print("Generating Flutter project...")
         
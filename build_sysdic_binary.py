@@ -0,0 +1,102 @@
+"""
+Janome システム辞書のバイナリ変換スクリプト
+
+ビルド時に生成された sysdic パッケージ (Pythonモジュール) から、
+mmap で読み込めるバイナリファイルを同じディレクトリに書き出す。
+
+    python build_sysdic_binary.py [sysdicディレクトリ]
+
+- connections.bin: 連接コスト表 (connections1.py / connections2.py) を int16 の一次元配列にしたもの
+- entries.bin: 辞書エントリ (entries_compact*.py / entries_extra*.py) を固定長レコードと
+  UTF-8 文字列プールにしたもの
+- double_array.bin: 表層形 -> 形態素ID のダブル配列 (FST の代わりに Tokenizer が使う)
+
+バイナリファイルが無い場合、janome は従来どおり .py モジュールから読み込む。
+アプリのビルド (build_macos.py / build_mobile.py / build_instruction.sh) は flet build の前にこれを実行する。
+"""
+import os
+import sys
+import time
+from importlib import import_module
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from janome.dic import (  # noqa: E402
+    save_connections_binary, save_entries_binary, FILE_CONNECTIONS, FILE_ENTRIES, FILE_DOUBLE_ARRAY,
+)
+from janome.dat import save_double_array  # noqa: E402
+
+DEFAULT_SYSDIC_DIR = os.path.join("janome", "sysdic")
+
+
+def load_module(sysdic_dir, name):
+    """
+    sysdic ディレクトリ内のモジュールを読み込む (パッケージの __init__ は実行しない)
+    sys.modules には残さないので、呼ぶたびにファイルから読み直し、使い終われば解放される。
+    """
+    sys.path.insert(0, sysdic_dir)
+    sys.modules.pop(name, None)
+    try:
+        return import_module(name)
+    finally:
+        sys.modules.pop(name, None)
+        sys.path.remove(sysdic_dir)
+
+
+def build_connections(sysdic_dir):
+    t0 = time.perf_counter()
+    connections = list(load_module(sysdic_dir, "connections1").DATA)
+    connections.extend(load_module(sysdic_dir, "connections2").DATA)
+    save_connections_binary(connections, sysdic_dir)
+    path = os.path.join(sysdic_dir, FILE_CONNECTIONS)
+    print(f"{path}: {len(connections)}x{len(connections[0])} "
+          f"({os.path.getsize(path) / 1024 / 1024:.1f} MB, {time.perf_counter() - t0:.1f}s)")
+
+
+def entry_buckets(sysdic_dir):
+    """バケット毎に compact と extra を合わせたエントリを返す (メモリ節約のため1つずつ読む)"""
+    buckets = load_module(sysdic_dir, "entries_buckets").DATA
+    for i in sorted(buckets):
+        start, end = buckets[i]
+        compact = load_module(sysdic_dir, f"entries_compact{i}")
+        extra = load_module(sysdic_dir, f"entries_extra{i}")
+        entries = {k: v + extra.DATA[k] for k, v in compact.DATA.items()}
+        del compact, extra
+        yield start, end, entries
+
+
+def build_entries(sysdic_dir):
+    t0 = time.perf_counter()
+    save_entries_binary(entry_buckets(sysdic_dir), sysdic_dir)
+    path = os.path.join(sysdic_dir, FILE_ENTRIES)
+    print(f"{path}: {os.path.getsize(path) / 1024 / 1024:.1f} MB, {time.perf_counter() - t0:.1f}s")
+
+
+def surfaces(sysdic_dir):
+    """(表層形, 形態素ID) を返す (FST と同じデータ)"""
+    buckets = load_module(sysdic_dir, "entries_buckets").DATA
+    for i in sorted(buckets):
+        compact = load_module(sysdic_dir, f"entries_compact{i}")
+        for morph_id, entry in compact.DATA.items():
+            yield entry[0], morph_id
+
+
+def build_double_array(sysdic_dir):
+    t0 = time.perf_counter()
+    path = os.path.join(sysdic_dir, FILE_DOUBLE_ARRAY)
+    save_double_array(surfaces(sysdic_dir), path)
+    print(f"{path}: {os.path.getsize(path) / 1024 / 1024:.1f} MB, {time.perf_counter() - t0:.1f}s")
+
+
+def main():
+    sysdic_dir = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SYSDIC_DIR)
+    if not os.path.isdir(sysdic_dir):
+        print(f"❌ Error: {sysdic_dir} not found.")
+        sys.exit(1)
+    build_connections(sysdic_dir)
+    build_entries(sysdic_dir)
+    build_double_array(sysdic_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# Copyright 2015 moco_beta
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Double-array trie over UTF-8 surfaces, used as a drop-in replacement for :class:`janome.fst.Matcher`.
+
+A node s has its children at base[s] + code, where code is (byte + 1) for a byte of the key and 0
+for the end of a key; a slot t belongs to s if check[t] == s. The end-of-key slot of a key keeps
+-(key index + 1) in base, and the morph ids of the key are ids[value_offsets[k]:value_offsets[k + 1]].
+"""
+
+import mmap
+import sys
+from array import array
+from struct import pack, Struct
+
+_MAGIC = b'JDA1'
+_HEADER = Struct('<4sIII')  # magic, array size, keys, morph ids
+_ROOT = 0
+_END = 0  # code of the end of a key
+
+
+def build_double_array(surfaces):
+    """
+    Build the double array from (surface, morph_id) pairs.
+
+    :param surfaces: iterable of (surface str, morph id). A surface may appear with several morph ids.
+    :return: tuple of (base, check, value_offsets, ids) arrays
+    """
+    key_ids = {}
+    for surface, morph_id in surfaces:
+        if not surface:
+            continue
+        key_ids.setdefault(surface.encode('utf-8'), []).append(morph_id)
+    keys = sorted(key_ids)
+    if not keys:
+        raise ValueError('no surfaces to build the double array')
+
+    value_offsets = array('I', [0])
+    ids = array('I')
+    for key in keys:
+        ids.extend(key_ids[key])
+        value_offsets.append(len(ids))
+
+    base = array('i', [0] * 1024)
+    check = array('i', [-1] * 1024)
+    used = bytearray(1024)
+    used[_ROOT] = 1
+    next_free = 1
+
+    # (node, depth, keys[lo:hi] share the first depth bytes)
+    stack = [(_ROOT, 0, 0, len(keys))]
+    while stack:
+        node, depth, lo, hi = stack.pop()
+        # children codes and the key ranges below them
+        codes = []
+        ranges = []
+        i = lo
+        if len(keys[i]) == depth:
+            codes.append(_END)
+            ranges.append((i, i + 1))
+            i += 1
+        while i < hi:
+            code = keys[i][depth] + 1
+            j = i + 1
+            while j < hi and keys[j][depth] + 1 == code:
+                j += 1
+            codes.append(code)
+            ranges.append((i, j))
+            i = j
+
+        # first base where all the children slots are free
+        while next_free < len(used) and used[next_free]:
+            next_free += 1
+        pos = next_free
+        while True:
+            b = pos - codes[0]
+            if b >= 1 and all(not used[b + c] for c in codes if b + c < len(used)):
+                break
+            pos += 1
+            while pos < len(used) and used[pos]:
+                pos += 1
+        size = b + codes[-1] + 1
+        if size > len(used):
+            grow = max(size, len(used) * 2) - len(used)
+            base.extend([0] * grow)
+            check.extend([-1] * grow)
+            used.extend(bytes(grow))
+
+        base[node] = b
+        for code, (i, j) in zip(codes, ranges):
+            t = b + code
+            used[t] = 1
+            check[t] = node
+            if code == _END:
+                base[t] = -(i + 1)
+            else:
+                stack.append((t, depth + 1, i, j))
+
+    size = len(used)
+    while size > 1 and not used[size - 1]:
+        size -= 1
+    return base[:size], check[:size], value_offsets, ids
+
+
+def save_double_array(surfaces, file):
+    """Build the double array from (surface, morph_id) pairs and save it to the file."""
+    arrays = build_double_array(surfaces)
+    base, check, value_offsets, ids = arrays
+    with open(file, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(base), len(value_offsets) - 1, len(ids)))
+        for a in arrays:
+            if sys.byteorder != 'little':
+                a = array(a.typecode, a)
+                a.byteswap()
+            a.tofile(f)
+
+
+def _array_view(mm, offset, count, typecode):
+    if sys.byteorder != 'little':
+        a = array(typecode, mm[offset:offset + count * 4])
+        a.byteswap()
+        return a
+    return memoryview(mm)[offset:offset + count * 4].cast(typecode)
+
+
+class DoubleArrayMatcher(object):
+    """
+    Common prefix search on the double-array trie.
+
+    :meth:`run` has the same signature and result as :meth:`janome.fst.Matcher.run`;
+    :meth:`morph_ids` returns the morph ids as ints. The arrays are read-only, so no cache or lock is needed.
+    """
+
+    def __init__(self, base, check, value_offsets, ids, mm=None):
+        self.base = base
+        self.check = check
+        self.value_offsets = value_offsets
+        self.ids = ids
+        self.size = len(base)
+        self.mm = mm
+
+    @classmethod
+    def load(cls, file):
+        """Memory-map the double array saved by :func:`save_double_array`."""
+        with open(file, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, num_keys, num_ids = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or len(mm) != _HEADER.size + (size * 2 + num_keys + 1 + num_ids) * 4:
+            mm.close()
+            raise ValueError(f'invalid double array file: {file}')
+        pos = _HEADER.size
+        base = _array_view(mm, pos, size, 'i')
+        pos += size * 4
+        check = _array_view(mm, pos, size, 'i')
+        pos += size * 4
+        value_offsets = _array_view(mm, pos, num_keys + 1, 'I')
+        pos += (num_keys + 1) * 4
+        ids = _array_view(mm, pos, num_ids, 'I')
+        return cls(base, check, value_offsets, ids, mm)
+
+    def morph_ids(self, word, common_prefix_match=True):
+        """Morph ids of the keys that are prefixes of word (bytes), shortest first."""
+        base, check, value_offsets, size = self.base, self.check, self.value_offsets, self.size
+        res = []
+        s = _ROOT
+        for b in word:
+            if common_prefix_match:
+                t = base[s]
+                if check[t] == s:
+                    k = -base[t] - 1
+                    res.extend(self.ids[value_offsets[k]:value_offsets[k + 1]])
+            t = base[s] + b + 1
+            if t >= size or check[t] != s:
+                return res
+            s = t
+        t = base[s]
+        if check[t] == s:
+            k = -base[t] - 1
+            res.extend(self.ids[value_offsets[k]:value_offsets[k + 1]])
+        return res
+
+    def run(self, word, common_prefix_match=True):
+        outputs = set(pack('I', morph_id) for morph_id in self.morph_ids(word, common_prefix_match))
+        return bool(outputs), outputs
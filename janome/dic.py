@@ -17,7 +17,7 @@ import os
 import io
 import pickle
 import gzip
-from struct import pack, unpack
+from struct import pack, unpack, calcsize, Struct
 import traceback
 import logging
 import sys
@@ -25,6 +25,9 @@ import re
 import pkgutil
 import zlib
 import base64
+import mmap
+from array import array
+from bisect import bisect_right
 from functools import lru_cache
 from .fst import Matcher, create_minimum_transducer, compileFST
 
@@ -44,6 +47,9 @@ MODULE_CONNECTIONS = 'connections%d.py'
 MODULE_CHARDEFS = 'chardef.py'
 MODULE_UNKNOWNS = 'unknowns.py'
 
+FILE_CONNECTIONS = 'connections.bin'
+FILE_ENTRIES = 'entries.bin'
+FILE_DOUBLE_ARRAY = 'double_array.bin'
 FILE_USER_FST_DATA = 'user_fst.data'
 FILE_USER_ENTRIES_DATA = 'user_entries.data'
 
@@ -82,6 +88,70 @@ def save_connections(connections, dir='.'):
         offset += bucket_size
 
 
+def save_connections_binary(connections, dir='.'):
+    """
+    Save the connection cost matrix as a flat int16 (little endian) binary file
+    that can be memory-mapped by :class:`ConnectionMatrix`.
+    """
+    cols = len(connections[0]) if connections else 0
+    costs = array('h')
+    for row in connections:
+        if len(row) != cols:
+            raise ValueError('connection cost matrix must be rectangular')
+        costs.extend(row)
+    if sys.byteorder != 'little':
+        costs.byteswap()
+    with open(os.path.join(dir, FILE_CONNECTIONS), 'wb') as f:
+        f.write(pack(_CONNECTIONS_HEADER, _CONNECTIONS_MAGIC, len(connections), cols))
+        costs.tofile(f)
+
+
+def save_entries_binary(buckets, dir='.'):
+    """
+    Save the dictionary entries as a fixed-layout binary file that can be memory-mapped by
+    :class:`EntryStore`.
+
+    :param buckets: iterable of (start morph id, end morph id, entries) in ascending order of morph
+                    ids. entries maps each morph id in [start, end) to its full (10 fields) entry.
+    """
+    bucket_table = []
+    compact_records = bytearray()
+    extra_records = bytearray()
+    string_ids = {}
+    string_offsets = array('I', [0])
+    pool = bytearray()
+
+    def string_id(s):
+        sid = string_ids.get(s)
+        if sid is None:
+            sid = string_ids[s] = len(string_ids)
+            pool.extend(s.encode('utf-8'))
+            string_offsets.append(len(pool))
+        return sid
+
+    num_records = 0
+    for start, end, entries in buckets:
+        bucket_table.append(_ENTRIES_BUCKET.pack(start, end, num_records))
+        for morph_id in range(start, end):
+            e = entries[morph_id]
+            compact_records.extend(_ENTRIES_COMPACT.pack(string_id(e[0]), e[1], e[2], e[3]))
+            extra = _EXTRA_SEPARATOR.join(e[4:10])
+            if extra.count(_EXTRA_SEPARATOR) != 5:
+                raise ValueError(f'unexpected extra fields of morph id {morph_id}')
+            extra_records.extend(_ENTRIES_EXTRA.pack(string_id(extra)))
+            num_records += 1
+    if sys.byteorder != 'little':
+        string_offsets.byteswap()
+    with open(os.path.join(dir, FILE_ENTRIES), 'wb') as f:
+        f.write(_ENTRIES_HEADER.pack(_ENTRIES_MAGIC, len(bucket_table), num_records, len(string_ids)))
+        for b in bucket_table:
+            f.write(b)
+        f.write(compact_records)
+        f.write(extra_records)
+        string_offsets.tofile(f)
+        f.write(pool)
+
+
 def save_chardefs(chardefs, dir='.'):
     _save_as_module(os.path.join(dir, MODULE_CHARDEFS), chardefs)
 
@@ -181,6 +251,143 @@ def _save_entry_as_module_extra(file, morph_id, entry):
             f.write('),')
 
 
+_CONNECTIONS_MAGIC = b'JCM1'
+_CONNECTIONS_HEADER = '<4sII'  # magic, rows (right ids), cols (left ids)
+
+
+class ConnectionMatrix(object):
+    """
+    Connection cost matrix (right_id x left_id) stored as a flat int16 sequence.
+
+    Loaded from the binary file, the matrix is memory-mapped read-only, so its pages are
+    shared by all processes instead of being held as boxed ints in each of them.
+    """
+
+    def __init__(self, costs, rows, cols, mm=None):
+        self.costs = costs
+        self.rows = rows
+        self.cols = cols
+        self.mm = mm
+
+    @classmethod
+    def load(cls, file):
+        with open(file, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_size = calcsize(_CONNECTIONS_HEADER)
+        magic, rows, cols = unpack(_CONNECTIONS_HEADER, mm[:header_size])
+        if magic != _CONNECTIONS_MAGIC or len(mm) != header_size + rows * cols * 2:
+            mm.close()
+            raise LoadingDictionaryError()
+        if sys.byteorder != 'little':
+            costs = array('h', mm[header_size:])
+            costs.byteswap()
+            mm.close()
+            return cls(costs, rows, cols)
+        return cls(memoryview(mm)[header_size:].cast('h'), rows, cols, mm)
+
+    @classmethod
+    def from_rows(cls, connections):
+        """Build an in-memory matrix from a list of rows (the ``connections*.py`` modules)."""
+        if isinstance(connections, ConnectionMatrix):
+            return connections
+        cols = len(connections[0]) if connections else 0
+        costs = array('h')
+        for row in connections:
+            costs.extend(row)
+        return cls(costs, len(connections), cols)
+
+    def get(self, id1, id2):
+        return self.costs[id1 * self.cols + id2]
+
+    def __getitem__(self, id1):
+        # row view, for callers indexing the matrix as connections[id1][id2]
+        return self.costs[id1 * self.cols:(id1 + 1) * self.cols]
+
+    def __len__(self):
+        return self.rows
+
+    def to_numpy(self):
+        """2-D NumPy view of the matrix (no copy)."""
+        import numpy as np
+        return np.frombuffer(self.costs, dtype=np.int16).reshape(self.rows, self.cols)
+
+
+_ENTRIES_MAGIC = b'JEN1'
+_ENTRIES_HEADER = Struct('<4sIII')  # magic, buckets, records, strings
+_ENTRIES_BUCKET = Struct('<III')  # start morph id, end morph id, first record
+_ENTRIES_COMPACT = Struct('<IHHh')  # surface, left_id, right_id, cost
+_ENTRIES_EXTRA = Struct('<I')  # part_of_speech ... phonetic, joined by _EXTRA_SEPARATOR
+_ENTRIES_STRING = Struct('<II')  # start / end of a string in the pool
+_EXTRA_SEPARATOR = '\x00'
+
+
+class EntryStore(object):
+    """
+    Dictionary entries in a fixed-layout binary file, memory-mapped read-only.
+
+    Layout: header, bucket index (morph id ranges, searched by bisect), fixed-width compact and
+    extra records, string offset table and UTF-8 string pool. Strings in records are ids of
+    the (deduplicated) pool strings; the six extra fields are stored as one joined string so
+    that they are read with a single slice and decode.
+    """
+
+    def __init__(self, mm):
+        self.mm = mm
+        magic, num_buckets, num_records, num_strings = _ENTRIES_HEADER.unpack_from(mm, 0)
+        if magic != _ENTRIES_MAGIC:
+            raise LoadingDictionaryError()
+        pos = _ENTRIES_HEADER.size
+        self.buckets = [_ENTRIES_BUCKET.unpack_from(mm, pos + i * _ENTRIES_BUCKET.size)
+                        for i in range(num_buckets)]
+        self.bucket_starts = [b[0] for b in self.buckets]
+        pos += num_buckets * _ENTRIES_BUCKET.size
+        self.compact_pos = pos
+        pos += num_records * _ENTRIES_COMPACT.size
+        self.extra_pos = pos
+        pos += num_records * _ENTRIES_EXTRA.size
+        self.strings_pos = pos
+        self.pool_pos = pos + (num_strings + 1) * 4
+        if len(mm) < self.pool_pos:
+            raise LoadingDictionaryError()
+
+    @classmethod
+    def load(cls, file):
+        with open(file, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mm)
+        except Exception:
+            mm.close()
+            raise LoadingDictionaryError()
+
+    def _record(self, idx):
+        i = bisect_right(self.bucket_starts, idx) - 1
+        if i < 0:
+            raise KeyError(idx)
+        start, end, first = self.buckets[i]
+        if idx >= end:
+            raise KeyError(idx)
+        return first + idx - start
+
+    def _string(self, sid):
+        start, end = _ENTRIES_STRING.unpack_from(self.mm, self.strings_pos + sid * 4)
+        return self.mm[self.pool_pos + start:self.pool_pos + end].decode('utf-8')
+
+    def entry(self, idx):
+        """(surface, left_id, right_id, cost) of the morph id"""
+        sid, left_id, right_id, cost = _ENTRIES_COMPACT.unpack_from(
+            self.mm, self.compact_pos + self._record(idx) * _ENTRIES_COMPACT.size)
+        return (self._string(sid), left_id, right_id, cost)
+
+    def extra(self, idx):
+        """(part_of_speech, infl_type, infl_form, base_form, reading, phonetic) of the morph id"""
+        sid, = _ENTRIES_EXTRA.unpack_from(self.mm, self.extra_pos + self._record(idx) * _ENTRIES_EXTRA.size)
+        return tuple(self._string(sid).split(_EXTRA_SEPARATOR))
+
+    def close(self):
+        self.mm.close()
+
+
 class Dictionary(ABC):
     """
     Base dictionary class
@@ -206,22 +413,23 @@ class RAMDictionary(Dictionary):
 
     def __init__(self, entries, connections):
         self.entries = entries
-        self.connections = connections
+        self.connections = ConnectionMatrix.from_rows(connections)
+        self._trans_costs = self.connections.costs
+        self._num_left_ids = self.connections.cols
 
     def lookup(self, s, matcher):
-        (matched, outputs) = matcher.run(s)
-        if not matched:
+        morph_ids = matcher.morph_ids(s)
+        if not morph_ids:
             return []
         try:
             res = []
-            for e in outputs:
-                num = unpack('I', e)[0]
+            for num in morph_ids:
                 res.append((num,) + self.entries[num][:4])
             return res
         except Exception:
             logger.error('Cannot load dictionary data. The dictionary may be corrupted?')
             logger.error(f'input={s}')
-            logger.error(f'outputs={str(outputs)}')
+            logger.error(f'outputs={str(morph_ids)}')
             traceback.format_exc()
             sys.exit(1)
 
@@ -234,7 +442,7 @@ class RAMDictionary(Dictionary):
             sys.exit(1)
 
     def get_trans_cost(self, id1, id2):
-        return self.connections[id1][id2]
+        return self._trans_costs[id1 * self._num_left_ids + id2]
 
 
 class MMapDictionary(Dictionary):
@@ -244,32 +452,41 @@ class MMapDictionary(Dictionary):
 
     def __init__(self, entries_compact, entries_extra, open_files, connections):
         self.entries_compact = entries_compact
-        self.bucket_ranges = entries_compact.keys()
+        if isinstance(entries_compact, EntryStore):
+            # binary entry store (entries_extra is the same store, or None in compact mode)
+            self.entry_store = entries_compact
+            self.bucket_ranges = []
+        else:
+            self.entry_store = None
+            self.bucket_ranges = sorted(entries_compact.keys())
+        self.bucket_starts = [b[0] for b in self.bucket_ranges]
         self.entries_extra = entries_extra
         self.open_files = open_files
-        self.connections = connections
+        self.connections = ConnectionMatrix.from_rows(connections)
+        self._trans_costs = self.connections.costs
+        self._num_left_ids = self.connections.cols
 
     def lookup(self, s, matcher):
-        (matched, outputs) = matcher.run(s)
-        if not matched:
+        morph_ids = matcher.morph_ids(s)
+        if not morph_ids:
             return []
         try:
             matched_entries = []
-            for e in outputs:
-                idx = unpack('I', e)[0]
+            for idx in morph_ids:
                 matched_entries.append((idx,) + self._find_entry(idx))
             return matched_entries
         except Exception:
             logger.error('Cannot load dictionary data. The dictionary may be corrupted?')
             logger.error(f'input={s}')
-            logger.error(f'outputs={str(outputs)}')
+            logger.error(f'outputs={str(morph_ids)}')
             traceback.format_exc()
             sys.exit(1)
 
     @lru_cache(maxsize=8192)
     def _find_entry(self, idx):
-        bucket = next(filter(lambda b: idx >= b[0] and idx < b[1], self.bucket_ranges))
-        mm, mm_idx = self.entries_compact[bucket]
+        if self.entry_store is not None:
+            return self.entry_store.entry(idx)
+        mm, mm_idx = self.entries_compact[self._bucket(idx)]
         rel_idx = idx - mm_idx['offset']
         _pos1s = mm_idx['positions'][rel_idx] + 2
         _pos1e = mm.find(b"',", _pos1s)
@@ -289,8 +506,9 @@ class MMapDictionary(Dictionary):
     @lru_cache(maxsize=1024)
     def lookup_extra(self, idx):
         try:
-            bucket = next(filter(lambda b: idx >= b[0] and idx < b[1], self.bucket_ranges))
-            mm, mm_idx = self.entries_extra[bucket]
+            if self.entry_store is not None:
+                return self.entry_store.extra(idx)
+            mm, mm_idx = self.entries_extra[self._bucket(idx)]
             rel_idx = idx - mm_idx['offset']
             _pos1s = mm_idx['positions'][rel_idx] + 2
             _pos1e = mm.find(b"',u'", _pos1s)
@@ -317,9 +535,18 @@ class MMapDictionary(Dictionary):
             sys.exit(1)
 
     def get_trans_cost(self, id1, id2):
-        return self.connections[id1][id2]
+        return self._trans_costs[id1 * self._num_left_ids + id2]
+
+    def _bucket(self, idx):
+        bucket = self.bucket_ranges[bisect_right(self.bucket_starts, idx) - 1]
+        if not bucket[0] <= idx < bucket[1]:
+            raise KeyError(idx)
+        return bucket
 
     def __del__(self):
+        if self.entry_store is not None:
+            self.entry_store.close()
+            return
         for mm, mm_idx in self.entries_compact.values():
             mm.close()
         if self.entries_extra:
@@ -324,24 +324,40 @@ def compileFST(fst):
     return b''.join(arcs)
 
 
+class _PrefixCache(threading.local):
+    """
+    Per-thread LRU caches of the matcher (one per dict_data part).
+    Each thread sees only its own caches, so they are read and updated without a lock.
+    """
+
+    def __init__(self, dict_len):
+        # bytes -> (position, outputs (frozenset), buf)
+        self.caches = [OrderedDict() for _ in range(dict_len)]
+
+
 class Matcher(object):
     def __init__(self, dict_data, max_cache_size=1024, max_cached_word_len=8):
         if dict_data:
             self.dict_data = dict_data
             self.dict_len = len(dict_data)
-            # bytes -> (position, final_outputs, outputs)
-            self.cache = [OrderedDict() for _ in range(len(dict_data))]
+            self.cache = _PrefixCache(len(dict_data))
             self.max_cache_size = max_cache_size
             self.max_cached_word_len = max_cached_word_len
-            self.lock = threading.Lock()
 
     def run(self, word, common_prefix_match=True):
         output = set()
+        caches = self.cache.caches  # this thread's caches
         for i in range(self.dict_len):
-            output |= self._run(word, i, common_prefix_match)
+            output |= self._run(word, i, common_prefix_match, caches[i])
         return bool(output), output  # accept if output is not empty
 
-    def _run(self, word, data_num, common_prefix_match):
+    def morph_ids(self, word, common_prefix_match=True):
+        """Morph ids of the outputs (outputs of the dictionary FSTs are packed morph ids)"""
+        return [unpack('I', e)[0] for e in self.run(word, common_prefix_match)[1]]
+
+    def _run(self, word, data_num, common_prefix_match, cache):
+        # outputs of the cached prefix (immutable, shared with the cache) and the ones found after it
+        cached_outputs = frozenset()
         outputs = set()
         buf = b''
         i = pos = 0
@@ -351,12 +367,11 @@ class Matcher(object):
         # simple lru cache
         # any prefix is in cache?
         for j in range(min(word_len, self.max_cached_word_len), 2, -1):
-            if word[:j] in self.cache[data_num]:
-                pos, outputs, buf = self.cache[data_num][word[:j]]
+            prefix = word[:j]
+            if prefix in cache:
+                pos, cached_outputs, buf = cache[prefix]
                 # move this entry to top
-                with self.lock:
-                    del[self.cache[data_num][word[:j]]]
-                    self.cache[data_num][word[:j]] = (pos, set(outputs), buf)
+                cache.move_to_end(prefix)
                 # A cached entry found. We can skip to the position.
                 i = j
                 break
@@ -377,12 +392,11 @@ class Matcher(object):
                     break
                 pos += arc[5]
                 if i < self.max_cached_word_len:
-                    with self.lock:
-                        # add to cache
-                        self.cache[data_num][word[:i]] = (pos, set(outputs), buf)
-                        # check cache size
-                        if len(self.cache[data_num]) >= self.max_cache_size:
-                            self.cache[data_num].popitem(last=False)
+                    # add to cache
+                    cache[word[:i]] = (pos, cached_outputs.union(outputs) if outputs else cached_outputs, buf)
+                    # check cache size
+                    if len(cache) >= self.max_cache_size:
+                        cache.popitem(last=False)
             elif i < word_len:
                 if word[i] == arc[1]:
                     buf += arc[2]
@@ -395,7 +409,9 @@ class Matcher(object):
             else:   # i >= word_len
                 break
 
-        return outputs
+        if not cached_outputs:
+            return outputs
+        return cached_outputs.union(outputs) if outputs else cached_outputs
 
     @lru_cache(maxsize=4096)
     def next_arc(self, data, addr):
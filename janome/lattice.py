@@ -14,6 +14,13 @@
 
 import os
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
 
 class NodeType:
     SYS_DICT = "SYS_DICT"
@@ -236,3 +243,125 @@ class Lattice(object):
 
     def __str__(self):
         return '\n'.join(','.join(str(node) for node in nodes) for nodes in self.snodes)
+
+
+# ArrayLattice uses the NumPy gather when (end nodes x new nodes) at a position is at least this
+ARRAY_MIN_PAIRS = 128
+
+# larger than any path cost (initial min cost in ArrayLattice)
+_MAX_COST = 2 ** 62
+
+# larger than any SurfaceNode.num (used to mask out non-tied end nodes in ArrayLattice)
+_MAX_NUM = 2 ** 62
+
+
+def connection_matrix(dic):
+    """
+    Returns the connection costs of the dictionary as a 2-D NumPy array (right_id x left_id).
+    The array is a view of the dictionary's flat matrix and is cached on the dictionary object.
+    """
+    matrix = getattr(dic, 'connection_matrix', None)
+    if matrix is None:
+        matrix = dic.connections.to_numpy()
+        dic.connection_matrix = matrix
+    return matrix
+
+
+class ArrayLattice(Lattice):
+    """
+    Lattice that computes the best predecessors of the nodes at a position together.
+
+    Nodes added at the current position are queued. When the lattice moves forward, the right ids /
+    min costs / nums of the end nodes at the position are laid out as parallel arrays, and for
+    positions with many (end node, new node) pairs the transition costs of all pairs are taken from
+    the connection matrix with one NumPy gather (small positions use a plain loop over the arrays,
+    where NumPy call overhead would dominate).
+    The min-cost path is identical to Lattice, including the tie-break by SurfaceNode.num.
+    """
+
+    def __init__(self, size, dic):
+        if not NUMPY_AVAILABLE:
+            raise ImportError("ArrayLattice requires numpy")
+        super().__init__(size, dic)
+        self.conn = connection_matrix(dic)
+        self.pending = []
+
+    def add(self, node):
+        p = self.p
+        snodes = self.snodes[p]
+        node.pos = p
+        node.index = len(snodes)
+        snodes.append(node)
+        self.enodes[p + (len(node.surface) if hasattr(node, 'surface') else 1)].append(node)
+        self.pending.append(node)
+
+    def forward(self):
+        self._resolve()
+        return super().forward()
+
+    def end(self):
+        eos = EOS(self.p)
+        self.add(eos)
+        self._resolve()
+        # truncate snodes
+        self.snodes = self.snodes[:self.p + 1]
+
+    def _resolve(self):
+        nodes = self.pending
+        if not nodes:
+            return
+        self.pending = []
+        p = self.p
+        enodes = self.enodes[p]
+        # the end nodes at p all start before p, so their min costs are final
+        min_costs = [e.min_cost for e in enodes]
+        if len(enodes) * len(nodes) >= ARRAY_MIN_PAIRS:
+            self._resolve_array(enodes, min_costs, nodes)
+            return
+
+        # small positions: plain loop over the arrays (NumPy call overhead would dominate)
+        costs = self.dic.connections.costs
+        cols = self.dic.connections.cols
+        offsets = [e.right_id * cols for e in enodes]
+        for node in nodes:
+            left_id = node.left_id
+            min_cost, b, i = _MAX_COST, -1, 0
+            for offset, mc in zip(offsets, min_costs):
+                cost = mc + costs[offset + left_id]
+                if cost < min_cost:
+                    min_cost, b = cost, i
+                elif cost == min_cost and type(enodes[b]) is SurfaceNode and type(enodes[i]) is SurfaceNode \
+                        and enodes[i].num < enodes[b].num:
+                    b = i
+                i += 1
+            self._set_best(node, enodes[b], min_cost)
+
+    def _resolve_array(self, enodes, min_costs, nodes):
+        """Best predecessors of all the nodes with one gather of (end node x node) transition costs."""
+        nums = np.array([e.num if type(e) is SurfaceNode else -1 for e in enodes])
+        right_ids = np.array([e.right_id for e in enodes])
+        # costs[i, j]: cost of reaching nodes[j] through enodes[i]
+        costs = self.conn[right_ids[:, None], [node.left_id for node in nodes]] \
+            + np.array(min_costs, dtype=np.int64)[:, None]
+        best = costs.argmin(axis=0)
+        best_costs = costs.min(axis=0)
+
+        # tie-break: if the first min-cost end node is a SurfaceNode, the tied SurfaceNode
+        # with the smallest num wins (the first one among equal nums)
+        surface_best = nums[best] >= 0
+        if surface_best.any():
+            cols = np.flatnonzero(surface_best)
+            tied = (costs[:, cols] == best_costs[cols]) & (nums >= 0)[:, None]
+            best[cols] = np.where(tied, nums[:, None], _MAX_NUM).argmin(axis=0)
+
+        for node, b, min_cost in zip(nodes, best.tolist(), best_costs.tolist()):
+            self._set_best(node, enodes[b], min_cost)
+
+    def _set_best(self, node, best_node, path_cost):
+        min_cost = path_cost + node.cost
+        # same bound as Lattice.add: a predecessor must be cheaper than the initial min_cost
+        if min_cost >= node.min_cost:
+            raise ValueError(f"no reachable predecessor for node at {self.p}")
+        node.min_cost = min_cost
+        node.back_index = best_node.index
+        node.back_pos = best_node.pos
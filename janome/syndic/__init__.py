@@ -2,12 +2,17 @@
 import os, sys
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
-from janome.dic import LoadingDictionaryError
-from . import connections1, connections2
+from janome.dic import LoadingDictionaryError, ConnectionMatrix, EntryStore, FILE_CONNECTIONS, FILE_ENTRIES, FILE_DOUBLE_ARRAY
 from . import chardef, unknowns
 
-connections = list(connections1.DATA)
-connections.extend(connections2.DATA)
+if os.path.exists(os.path.join(base_dir, FILE_CONNECTIONS)):
+    # flat int16 matrix, memory-mapped and shared by all processes
+    connections = ConnectionMatrix.load(os.path.join(base_dir, FILE_CONNECTIONS))
+else:
+    from . import connections1, connections2
+    connections = ConnectionMatrix.from_rows(list(connections1.DATA) + list(connections2.DATA))
+    del connections1.DATA
+    del connections2.DATA
 
 __entries = None
 
@@ -71,6 +76,11 @@ def entries(compact = False):
     return __entries
 
 def mmap_entries(compact = False):
+    if os.path.exists(os.path.join(base_dir, FILE_ENTRIES)):
+        # fixed-layout binary entries, no text scanning
+        store = EntryStore.load(os.path.join(base_dir, FILE_ENTRIES))
+        return (store, None if compact else store, [])
+
     import mmap
     from importlib import import_module
     from . import entries_buckets
@@ -103,3 +113,10 @@ def all_fstdata():
     res.append(base64.b64decode(fst_data0.DATA))
     res.append(base64.b64decode(fst_data1.DATA))
     return res
+
+def double_array():
+    # double-array trie of the surfaces (None if not built; the FST is used instead)
+    if not os.path.exists(os.path.join(base_dir, FILE_DOUBLE_ARRAY)):
+        return None
+    from janome.dat import DoubleArrayMatcher
+    return DoubleArrayMatcher.load(os.path.join(base_dir, FILE_DOUBLE_ARRAY))
@@ -92,18 +92,19 @@ with user dictionary (simplified format):
 import sys
 import os
 from typing import Iterator, Union, Tuple, Optional, Any
-from .lattice import Lattice, Node, SurfaceNode, BOS, EOS, NodeType  # type: ignore
+from .lattice import Lattice, ArrayLattice, Node, SurfaceNode, BOS, EOS, NodeType  # type: ignore
+from .lattice import NUMPY_AVAILABLE as LATTICE_NUMPY_AVAILABLE  # type: ignore
 from .dic import UserDictionary, CompiledUserDictionary  # type: ignore
 from .system_dic import SystemDictionary, MMapSystemDictionary
 from .fst import Matcher
 
 try:
-    from janome.sysdic import all_fstdata, connections  # type: ignore
+    from janome.sysdic import all_fstdata, double_array, connections  # type: ignore
 except ImportError:
     # hack for unit testing...
     parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     sys.path.insert(0, parent_dir)
-    from sysdic import all_fstdata, connections  # type: ignore
+    from sysdic import all_fstdata, double_array, connections  # type: ignore
 
 
 DEFAULT_MMAP_MODE = sys.maxsize > 2**32
@@ -160,7 +161,8 @@ class Tokenizer(object):
                  max_unknown_length: int = 1024,
                  wakati: bool = False,
                  mmap: bool = DEFAULT_MMAP_MODE,
-                 dotfile: str = ''):
+                 dotfile: str = '',
+                 array_lattice: bool = False):
         """
         Initialize Tokenizer object with optional arguments.
 
@@ -173,13 +175,16 @@ class Tokenizer(object):
         :param mmap: (Optional) if given False, memory-mapped file mode is disabled.
                      Set this option to False on any environments that do not support mmap.
                      Default is True on 64bit architecture; otherwise False.
+        :param array_lattice: (Optional) if given True, the Viterbi search uses NumPy arrays
+                              (:class:`janome.lattice.ArrayLattice`). numpy is required.
+                              The result is identical to the default lattice.
 
         .. seealso:: http://mocobeta.github.io/janome/en/#use-with-user-defined-dictionary
         """
         self.sys_dic: Union[SystemDictionary, MMapSystemDictionary]
         self.user_dic: Optional[Union[UserDictionary, CompiledUserDictionary]]
         self.wakati = wakati
-        self.matcher = Matcher(all_fstdata())
+        self.matcher = double_array() or Matcher(all_fstdata())
         if mmap:
             self.sys_dic = MMapSystemDictionary.instance()
         else:
@@ -196,6 +201,9 @@ class Tokenizer(object):
         else:
             self.user_dic = None
         self.max_unknown_length = max_unknown_length
+        if array_lattice and not LATTICE_NUMPY_AVAILABLE:
+            raise ImportError("array_lattice=True requires numpy")
+        self.lattice_class = ArrayLattice if array_lattice else Lattice
 
     def tokenize(self, text: str, *, wakati: bool = False, baseform_unk: bool = True, dotfile: str = '') \
             -> Iterator[Union[Token, str]]:
@@ -233,7 +241,7 @@ class Tokenizer(object):
             raise WakatiModeOnlyException
 
         chunk_size = min(len(text), Tokenizer.MAX_CHUNK_SIZE)
-        lattice = Lattice(chunk_size, self.sys_dic)
+        lattice = self.lattice_class(chunk_size, self.sys_dic)
         pos = 0
         while not self.__should_split(text, pos):
             encoded_partial_text = text[pos:pos + min(50, chunk_size - pos)].encode('utf-8')
@@ -2,6 +2,8 @@ import logging
 import sys
 import os
 import traceback
+import threading
+import time
 from datetime import datetime
 
 # --- ログ監視用の設定 (Memory Handler) ---
@@ -60,6 +62,7 @@ def load_modules():
         raise ImportError(f"Failed to load modules: {e}")
 
 def main(page: ft.Page):
+    app_start = time.perf_counter()
     print("--- Main Function Called ---") # コンソール強制出力
     logging.info("--- Main Function Called ---")
     logging.info(f"Platform: {page.platform}")
@@ -93,14 +96,12 @@ def main(page: ft.Page):
     TextStyles = modules['styles'].TextStyles
     ComponentStyles = modules['styles'].ComponentStyles
     BrailleConverter = modules['braille_logic'].BrailleConverter
+    ConversionWorker = modules['braille_logic'].ConversionWorker
     SPACE_MARK = modules['braille_logic'].SPACE_MARK
-    DAKUTEN_MARK = modules['braille_logic'].DAKUTEN_MARK
-    HANDAKUTEN_MARK = modules['braille_logic'].HANDAKUTEN_MARK
-    NUM_INDICATOR = modules['braille_logic'].NUM_INDICATOR
-    FOREIGN_INDICATOR = modules['braille_logic'].FOREIGN_INDICATOR
-    YOON_MARK = modules['braille_logic'].YOON_MARK
-    YOON_DAKU_MARK = modules['braille_logic'].YOON_DAKU_MARK
-    YOON_HANDAKU_MARK = modules['braille_logic'].YOON_HANDAKU_MARK
+    PREFIX_MARKS = modules['braille_logic'].PREFIX_MARKS
+    CellLine = modules['braille_logic'].CellLine
+    mapped_data_to_legacy = modules['braille_logic'].mapped_data_to_legacy
+    mapped_data_from_legacy = modules['braille_logic'].mapped_data_from_legacy
     STLGenerator = modules['stl_generator'].STLGenerator
     HistoryManager = modules['history_manager'].HistoryManager
 
@@ -117,10 +118,28 @@ def main(page: ft.Page):
         pass 
     page.padding = 0
 
+    settings = {
+        "max_chars_per_line": 10,
+        "max_lines_per_plate": 4,
+        "plate_thickness": 0.6, 
+        "mesh_quality": "normal",
+        # プリンタのベッド寸法 [幅, 奥行き] mm (指定するとプレートをベッド毎にまとめて出力)
+        "bed_size": None,
+        "bed_spacing": 5.0,
+        # 点・補強リングを台座に縫い合わせた閉じたメッシュで出力 (スライサーでの修復不要)
+        "welded_mesh": False,
+        # 入力が止まってから点字に変換するまでの待ち時間 (秒)
+        "conversion_debounce": 0.15,
+        # 出力したプレートをメモリに残す上限 (MB)。同じ内容のプレートは再出力時に作り直さない (0 で無効)
+        "plate_cache_mb": 8,
+        "use_quick_save": False
+    }
+
     # --- ロジック初期化 ---
     try:
-        converter = BrailleConverter()
-        stl_generator = STLGenerator()
+        # 辞書 (Janome) は最初の画面を出してから裏で読み込む。読み込み中は簡易変換
+        converter = BrailleConverter(background_load=True)
+        stl_generator = STLGenerator(cache_max_bytes=int(settings["plate_cache_mb"] * 1024 * 1024))
         history_manager = HistoryManager(page)
     except Exception as e:
         msg = f"Logic Init Error:\n{str(e)}\n{traceback.format_exc()}"
@@ -130,16 +149,19 @@ def main(page: ft.Page):
 
     # 状態管理
     state = {
-        "current_mapped_data": [],
+        # (元のテキスト, 変換結果) の組。変換スレッドからも入れ替えるので、
+        # 2つを別々に書き換えず、組ごと差し替える (変換結果のリストと単語の dict も書き換えない)
+        "conversion": ("", []),
         "editing_index": -1
     }
-    
-    settings = {
-        "max_chars_per_line": 10,
-        "max_lines_per_plate": 4,
-        "plate_thickness": 0.6, 
-        "use_quick_save": False
-    }
+    # state["conversion"] を読んで差し替えるまでの間に、変換スレッドの結果が割り込まないようにする
+    conversion_lock = threading.Lock()
+    # 画面の組み立て (プレビューの controls) と page.update() は変換スレッドからも行うので、このロックの中で行う
+    ui_lock = threading.RLock()
+
+    def update_page():
+        with ui_lock:
+            page.update()
 
     # UI参照用Ref
     txt_input_ref = ft.Ref[ft.TextField]()
@@ -168,7 +190,7 @@ def main(page: ft.Page):
             )
             page.overlay.append(snack)
             snack.open = True
-            page.update()
+            update_page()
         except Exception as e:
             logging.error(f"SnackBar Error: {e}")
 
@@ -177,14 +199,14 @@ def main(page: ft.Page):
             if dlg not in page.overlay:
                 page.overlay.append(dlg)
             dlg.open = True
-            page.update()
+            update_page()
         except Exception as e:
             logging.error(f"Open Dialog Error: {e}")
 
     def close_dialog(dlg):
         try:
             dlg.open = False
-            page.update()
+            update_page()
         except Exception as e:
             logging.error(f"Close Dialog Error: {e}")
 
@@ -210,7 +232,7 @@ def main(page: ft.Page):
                 thickness_slider_ref.current.label = f"{val:.1f}mm"
                 if thickness_label_ref.current: thickness_label_ref.current.value = f"{val:.1f}mm"
             
-            page.update()
+            update_page()
         except Exception as e:
             logging.warning(f"Sync UI Warning: {e}")
 
@@ -260,36 +282,20 @@ def main(page: ft.Page):
 
     # --- ロジック群 ---
     def split_cells_with_rules(all_cells, max_chars):
+        """セル列 (bytes) を行に分ける。前置符と次のセルは分けない。各行の (開始, 終了) を返す"""
         lines = []
-        current_line = []
-        units = []
+        line_start = 0
         i = 0
-        prefix_marks_vals = {
-            tuple(DAKUTEN_MARK), tuple(HANDAKUTEN_MARK), tuple(YOON_MARK),
-            tuple(YOON_DAKU_MARK), tuple(YOON_HANDAKU_MARK), tuple(NUM_INDICATOR), tuple(FOREIGN_INDICATOR)
-        }
+        n = len(all_cells)
         
-        while i < len(all_cells):
-            cell = all_cells[i]
-            cell_dots_tuple = tuple(cell['dots'])
-            is_prefix = (cell_dots_tuple in prefix_marks_vals)
-            
-            if is_prefix and i + 1 < len(all_cells):
-                units.append([cell, all_cells[i+1]])
-                i += 2
-            else:
-                units.append([cell])
-                i += 1
-                
-        for unit in units:
-            unit_len = len(unit)
-            if len(current_line) + unit_len > max_chars:
-                if len(current_line) > 0:
-                    lines.append(current_line)
-                    current_line = []
-            current_line.extend(unit)
-        if current_line:
-            lines.append(current_line)
+        while i < n:
+            unit_len = 2 if all_cells[i] in PREFIX_MARKS and i + 1 < n else 1
+            if i - line_start + unit_len > max_chars and i > line_start:
+                lines.append((line_start, i))
+                line_start = i
+            i += unit_len
+        if n > line_start:
+            lines.append((line_start, n))
         return lines
 
     def save_reading_edit(e):
@@ -298,12 +304,19 @@ def main(page: ft.Page):
             new_reading = edit_field_ref.current.value
             
             # 【修正点1】空文字も許容するように条件を変更（if new_reading: を削除）
-            # 空文字の場合、kana_to_cells は空リストを返すので点字も消えます
-            state["current_mapped_data"][state["editing_index"]]['reading'] = new_reading
-            new_cells = converter.kana_to_cells(new_reading)
-            state["current_mapped_data"][state["editing_index"]]['cells'] = new_cells
-            state["current_mapped_data"][state["editing_index"]]['braille'] = [c['dots'] for c in new_cells]
-            
+            # 空文字の場合、kana_to_cells は空のセル列を返すので点字も消えます
+            new_cells, new_chars = converter.kana_to_cells(new_reading)
+            index = state["editing_index"]
+            with conversion_lock:
+                # 変換中の依頼が元データを持っているので、書き換えずに新しいリストを作る
+                text, mapped_data = state["conversion"]
+                item = dict(mapped_data[index], reading=new_reading, cells=new_cells, chars=new_chars)
+                state["conversion"] = (text, mapped_data[:index] + [item] + mapped_data[index + 1:])
+
+            # 修正前のデータで変換中の依頼があれば、修正後のデータから変換し直す
+            current_text = txt_input_ref.current.value if txt_input_ref.current else ""
+            if current_text != text:
+                update_braille_from_input(current_text)
             render_braille_preview()
             
             msg = "読みを修正しました" if new_reading else "読みを消去しました"
@@ -326,42 +339,47 @@ def main(page: ft.Page):
 
     def open_edit_dialog(index):
         state["editing_index"] = index
-        item = state["current_mapped_data"][index]
+        item = state["conversion"][1][index]
         edit_dialog.title = ft.Text(f"「{item['orig']}」の読みを修正")
         if edit_field_ref.current:
             edit_field_ref.current.value = item['reading']
         open_dialog(edit_dialog)
 
     def render_braille_preview():
+        """変換結果からプレビューを作り直す (どのスレッドから呼んでもよい)"""
+        with ui_lock:
+            _render_braille_preview()
+
+    def _render_braille_preview():
         try:
             braille_display_area.controls.clear()
+            mapped_data = state["conversion"][1]
             
-            flat_cells_all = []
+            # セル列と、セル毎の表示文字・元の単語のインデックスを並べて持つ
+            flat_cells_all = bytearray()
+            flat_chars = []
+            flat_word_idx = []
             
             # 【修正点2】中身が空のアイテム（消去された単語）を除外したインデックスリストを作成
             # これにより、空の単語の前後に無駄なスペースが入るのを防ぎます
             valid_indices = [
-                i for i, item in enumerate(state["current_mapped_data"]) 
+                i for i, item in enumerate(mapped_data) 
                 if item['cells'] and len(item['cells']) > 0
             ]
             
             for i, word_idx in enumerate(valid_indices):
-                item = state["current_mapped_data"][word_idx]
+                item = mapped_data[word_idx]
                 
                 # 点字セルを追加
-                for cell in item['cells']:
-                    flat_cells_all.append({
-                        'dots': cell['dots'],
-                        'char': cell['char'],
-                        'word_idx': word_idx, # クリック時のために元のインデックスを保持
-                        'orig': item['orig']
-                    })
+                flat_cells_all += item['cells']
+                flat_chars.extend(item['chars'])
+                flat_word_idx.extend([word_idx] * len(item['cells'])) # クリック時のために元のインデックスを保持
                 
                 # 最後の有効な単語でなければスペースを追加
                 if i < len(valid_indices) - 1:
-                    flat_cells_all.append({
-                        'dots': SPACE_MARK, 'char': ' ', 'word_idx': -1, 'orig': '(Space)'
-                    })
+                    flat_cells_all.append(SPACE_MARK)
+                    flat_chars.append(' ')
+                    flat_word_idx.append(-1)
             
             chars_per_line = int(settings["max_chars_per_line"])
             lines_per_plate = int(settings["max_lines_per_plate"])
@@ -373,15 +391,15 @@ def main(page: ft.Page):
                 plate_num = i + 1
                 plate_content_controls = []
                 
-                for line_cells in plate_lines:
+                for line_start, line_end in plate_lines:
                     row_controls = []
-                    for cell_info in line_cells:
-                        cell_dots = cell_info['dots']
-                        char_str = cell_info['char']
-                        word_idx = cell_info['word_idx']
+                    for k in range(line_start, line_end):
+                        cell = flat_cells_all[k]
+                        char_str = flat_chars[k]
+                        word_idx = flat_word_idx[k]
                         
-                        col1 = ft.Column(spacing=2, controls=[_make_dot(cell_dots[0]), _make_dot(cell_dots[1]), _make_dot(cell_dots[2])])
-                        col2 = ft.Column(spacing=2, controls=[_make_dot(cell_dots[3]), _make_dot(cell_dots[4]), _make_dot(cell_dots[5])])
+                        col1 = ft.Column(spacing=2, controls=[_make_dot(cell & 1), _make_dot(cell & 2), _make_dot(cell & 4)])
+                        col2 = ft.Column(spacing=2, controls=[_make_dot(cell & 8), _make_dot(cell & 16), _make_dot(cell & 32)])
                         
                         cell_ui = ft.Container(
                             content=ft.Column([
@@ -436,10 +454,14 @@ def main(page: ft.Page):
 
             # 編集済みデータがあればそれを使う（手動修正を復元）
             if item.get("mapped_data"):
-                state["current_mapped_data"] = item["mapped_data"]
+                # 以前の版の結果は空白の単語が無いので補う (差分変換で手で直した読みを残すため)
+                mapped_data = converter.normalize_mapped_data(restored_text, mapped_data_from_legacy(item["mapped_data"]))
+                with conversion_lock:
+                    conversion_worker.cancel()
+                    state["conversion"] = (restored_text, mapped_data)
                 render_braille_preview()
             else:
-                update_braille_from_input(restored_text)
+                update_braille_from_input(restored_text, incremental=False)
                 
             show_snackbar(f"履歴を復元しました: {item.get('timestamp')}")
         except Exception as ex:
@@ -480,36 +502,60 @@ def main(page: ft.Page):
             logging.error(f"History Dialog Error: {ex}")
             show_snackbar("履歴読み込みエラー", is_error=True)
 
-    def update_braille_from_input(text):
-        try:
-            if not text:
-                state["current_mapped_data"] = []
-                braille_display_area.controls.clear()
-                page.update()
+    def update_braille_from_input(text, incremental=True):
+        """変換をバックグラウンドに依頼する。入力が続く間は待ち、最新の入力の結果だけ反映する"""
+        if incremental:
+            # 前回のテキストからの差分 (変わった文) だけ変換し直す。手で直した読みは残る
+            base_text, base_mapped_data = state["conversion"]
+            conversion_worker.submit(text, base_text, base_mapped_data)
+        else:
+            conversion_worker.submit(text, immediate=True)
+
+    def apply_conversion_result(generation, text, mapped_data):
+        """変換結果の反映 (変換スレッドから呼ばれる)"""
+        with conversion_lock:
+            if not conversion_worker.is_current(generation):
                 return
-            state["current_mapped_data"] = converter.convert_with_mapping(text)
-            render_braille_preview()
-        except Exception as e:
-            logging.error(f"Conversion Error: {e}")
-
-    def get_structured_data_for_export():
-        flat_cells_all = []
-        for word_idx, item in enumerate(state["current_mapped_data"]):
-            # エクスポート時も空データを除外するかどうかですが、
-            # プレビューと一致させるため、空のセルリストを持つものはスキップします
-            if not item['cells']:
-                continue
+            state["conversion"] = (text, mapped_data)
+        render_braille_preview()
+
+    conversion_worker = ConversionWorker(converter, apply_conversion_result, debounce=settings["conversion_debounce"])
+
+    def flush_conversion():
+        """
+        入力中のテキストの変換を待って (テキスト, 変換結果) を返す。保存・書き出しの前に呼ぶ。
+        入力待ち (debounce) ・変換中なら今の入力をすぐに変換して待つ。入力と一致する結果が無ければ None。
+        """
+        text = txt_input_ref.current.value if txt_input_ref.current else ""
+        base_text, base_mapped_data = state["conversion"]
+        if base_text != text:
+            conversion_worker.wait(conversion_worker.submit(text, base_text, base_mapped_data, immediate=True))
+        conversion = state["conversion"]
+        return conversion if conversion[0] == text else None
+
+    def on_tokenizer_ready():
+        """辞書の読み込み完了: 簡易変換で表示していたテキストを変換し直す"""
+        logging.info(f"Time to tokenizer ready: {(converter.tokenizer_ready_at - app_start) * 1000:.0f} ms "
+                     f"(load {(converter.tokenizer_load_seconds or 0) * 1000:.0f} ms)")
+        text = txt_input_ref.current.value if txt_input_ref.current else ""
+        if text and converter.use_kakasi:
+            update_braille_from_input(text, incremental=False)
+
+    def get_structured_data_for_export(mapped_data):
+        flat_cells_all = bytearray()
+        flat_chars = []
+        # プレビューと同じく、空のセルリストを持つもの (消去した単語・文書の先頭や末尾の空白) は除外し、
+        # 有効な単語の間にだけスペースを入れる
+        valid_items = [item for item in mapped_data if item['cells']]
+        for i, item in enumerate(valid_items):
+            flat_cells_all += item['cells']
+            flat_chars.extend(item['chars'])
+            if i < len(valid_items) - 1:
+                flat_cells_all.append(SPACE_MARK)
+                flat_chars.append(' ')
                 
-            for cell in item['cells']:
-                flat_cells_all.append(cell) 
-            
-            # 次の「有効な」要素がある場合のみスペースを入れたいが、
-            # 簡易的に末尾以外にはスペースを入れる（ただし厳密にはプレビューと同じロジックが望ましい）
-            # ここでは既存ロジックを維持しつつ、もし問題があれば valid_indices 方式に合わせる
-            if word_idx < len(state["current_mapped_data"]) - 1:
-                flat_cells_all.append({'dots': SPACE_MARK, 'char': ' '})
-                
-        lines = split_cells_with_rules(flat_cells_all, settings["max_chars_per_line"])
+        lines = [CellLine(bytes(flat_cells_all[start:end]), tuple(flat_chars[start:end]))
+                 for start, end in split_cells_with_rules(flat_cells_all, settings["max_chars_per_line"])]
         lines_per_plate = settings["max_lines_per_plate"]
         plates = [lines[i:i + lines_per_plate] for i in range(0, len(lines), lines_per_plate)]
         return plates
@@ -517,14 +563,18 @@ def main(page: ft.Page):
     def handle_save_button_click(e):
         # print("DEBUG: handle_save_button_click called")
         logging.info("Action: Save button clicked")
-        if not state["current_mapped_data"]:
+        conversion = flush_conversion()
+        if conversion is None:
+            show_snackbar("点字への変換が終わっていません", is_error=True)
+            return
+        current_text, mapped_data = conversion
+        if not mapped_data:
             show_snackbar("データがありません", is_error=True)
             return
         
         # 保存前に履歴に追加 (現在の状態をスナップショット保存)
         try:
-            current_text = txt_input_ref.current.value if txt_input_ref.current else ""
-            history_manager.add_entry(current_text, settings, state["current_mapped_data"])
+            history_manager.add_entry(current_text, settings, mapped_data_to_legacy(mapped_data))
         except Exception as he:
             logging.error(f"History Save Error: {he}")
         try:
@@ -602,13 +652,30 @@ def main(page: ft.Page):
             show_snackbar(f"保存失敗: {str(ex)}", is_error=True)
 
     def _perform_export(path):
-        plates_data = get_structured_data_for_export()
-        original_txt = txt_input_ref.current.value if txt_input_ref.current else ""
+        # 点字と original_text.txt は同じテキストから作る (入力直後なら変換を待つ)
+        conversion = flush_conversion()
+        if conversion is None:
+            raise RuntimeError("点字への変換が終わっていません")
+        original_txt, mapped_data = conversion
+        plates_data = get_structured_data_for_export(mapped_data)
+        estimate = stl_generator.estimate(plates_data, settings["plate_thickness"], quality=settings["mesh_quality"], original_text_str=original_txt, welded=settings["welded_mesh"])
+        logging.info(f"Export estimate: {estimate['total_triangles']} triangles, ZIP ~{estimate['zip_bytes'] / 1e6:.1f} MB, ~{estimate['seconds']:.1f} s")
         stl_generator.generate_package_from_plates(
             plates_data, path, 
             original_text_str=original_txt,
-            base_thickness=settings["plate_thickness"]
+            base_thickness=settings["plate_thickness"],
+            quality=settings["mesh_quality"],
+            bed_size=settings["bed_size"],
+            bed_spacing=settings["bed_spacing"],
+            welded=settings["welded_mesh"]
         )
+        export_info = stl_generator.last_export_info
+        logging.info(f"Export triangles: {export_info['total_triangles']} {export_info['triangles_per_plate']} ({export_info['tessellation']})")
+        plate_cache = stl_generator.plate_cache
+        if plate_cache is not None:
+            logging.info(f"Export regenerated plates: {export_info.get('regenerated_pages')} (cache hits {plate_cache.hits}, misses {plate_cache.misses})")
+        reading_cache = converter.cache_info()
+        logging.info(f"Reading cache: {reading_cache['size']}/{reading_cache['max_size']} entries, hits {reading_cache['hits']}, misses {reading_cache['misses']} ({reading_cache['hit_rate']:.0%})")
 
     def on_file_picked(e):
         if e.path:
@@ -641,7 +708,7 @@ def main(page: ft.Page):
             if chars_slider_ref.current: chars_slider_ref.current.label = f"{val}"
             settings["max_chars_per_line"] = val
             history_manager.save_settings(settings)
-            page.update()
+            update_page()
 
         def on_lines_change(e):
             val = int(e.control.value)
@@ -649,7 +716,7 @@ def main(page: ft.Page):
             if lines_slider_ref.current: lines_slider_ref.current.label = f"{val}"
             settings["max_lines_per_plate"] = val
             history_manager.save_settings(settings)
-            page.update()
+            update_page()
 
         def on_thick_change(e):
             val = float(e.control.value)
@@ -657,7 +724,7 @@ def main(page: ft.Page):
             if thickness_slider_ref.current: thickness_slider_ref.current.label = f"{val:.1f}mm"
             settings["plate_thickness"] = val
             history_manager.save_settings(settings)
-            page.update()
+            update_page()
 
         dlg = ft.AlertDialog(
             title=ft.Text("出力設定"),
@@ -770,6 +837,9 @@ def main(page: ft.Page):
 
     # 最後に確実に更新
     page.update()
+    logging.info(f"Time to first paint: {(time.perf_counter() - app_start) * 1000:.0f} ms"
+                 f"{' (dictionary loading)' if converter.is_loading else ''}")
+    converter.add_ready_callback(on_tokenizer_ready)
 
 if __name__ == "__main__":
     assets_path = os.path.join(os.getcwd(), "assets")
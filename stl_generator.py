@@ -1,54 +1,570 @@
+import io
+import os
+import json
 import struct
 import zipfile
+import zlib
 import math
-from braille_logic import BRAILLE_MAP, NUM_INDICATOR, SPACE_MARK
+import hashlib
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from braille_logic import BRAILLE_MAP, NUM_INDICATOR, SPACE_MARK, CellLine, cells_from_legacy
+
+# NumPyは任意 (無い環境では python エンジンのみ)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+ENGINE_PYTHON = "python"
+ENGINE_NUMPY = "numpy"
+
+FORMAT_STL = "stl"
+FORMAT_3MF = "3mf"
+FORMAT_PLY = "ply"
+EXPORT_FORMATS = (FORMAT_STL, FORMAT_3MF, FORMAT_PLY)
+
+STL_HEADER = b'Tenji P-Fab Generated STL' + b'\0' * (80 - 25)
+STL_FACET = struct.Struct('<12fH')
+
+# テッセレーション (分割数) ※ "normal" 品質の値
+PLATE_CORNER_SEGMENTS = 32
+TUBE_SEGMENTS = 32
+DOT_SEGMENTS = 24
+DOT_RINGS = 6
+
+# 出力品質 (テッセレーションの細かさ)
+# quality には下記プリセット名か、許容する弦誤差 (mm, float) を指定する
+QUALITY_DRAFT = "draft"
+QUALITY_NORMAL = "normal"
+QUALITY_FINE = "fine"
+QUALITY_PRESETS = {
+    QUALITY_DRAFT: {'corner_segments': 8, 'tube_segments': 16, 'dot_segments': 12, 'dot_rings': 3},
+    QUALITY_NORMAL: {'corner_segments': PLATE_CORNER_SEGMENTS, 'tube_segments': TUBE_SEGMENTS,
+                     'dot_segments': DOT_SEGMENTS, 'dot_rings': DOT_RINGS},
+    QUALITY_FINE: {'corner_segments': 48, 'tube_segments': 64, 'dot_segments': 48, 'dot_rings': 10},
+}
+
+# ストリーミング出力時に1回で書き出す三角形数の目安
+STREAM_BATCH_TRIANGLES = 20000
+
+# 見積もり (STLGenerator.estimate) 用の実測値 (通常品質, 20行x30マスの点字で計測)
+# ZIP (deflate) 圧縮後のサイズ比。3MF は内部で圧縮済みなので無圧縮で格納する
+ZIP_COMPRESSION_RATIOS = {FORMAT_STL: 0.149, FORMAT_PLY: 0.28, FORMAT_3MF: 1.0}
+# 法線を書かない (normals=False) STL は圧縮が効きやすい
+ZIP_COMPRESSION_RATIO_STL_NO_NORMALS = 0.135
+# 3MF (圧縮済み) の1三角形あたりのバイト数
+THREEMF_BYTES_PER_TRIANGLE = 7.9
+# 出力 (ZIP圧縮込み, 逐次) にかかる1三角形あたりの秒数
+EXPORT_SECONDS_PER_TRIANGLE = {
+    (ENGINE_PYTHON, FORMAT_STL): 2.4e-6, (ENGINE_PYTHON, FORMAT_PLY): 2.4e-6, (ENGINE_PYTHON, FORMAT_3MF): 3.7e-6,
+    (ENGINE_NUMPY, FORMAT_STL): 1.0e-6, (ENGINE_NUMPY, FORMAT_PLY): 1.2e-6, (ENGINE_NUMPY, FORMAT_3MF): 4.4e-6,
+}
+# ZIPのエントリ毎のヘッダ (ローカル + セントラルディレクトリ, ファイル名除く)
+ZIP_ENTRY_OVERHEAD = 76
+
+# プレートキャッシュ (メモリ) の上限バイト数 (モバイルでも負担にならない程度。0 でキャッシュしない)
+PLATE_CACHE_MAX_BYTES = 8 * 1024 * 1024
+# プレートキャッシュ (ディスク) の上限バイト数
+PLATE_CACHE_DISK_MAX_BYTES = 64 * 1024 * 1024
+# メッシュの形や出力の書式が変わる変更をしたら上げる (ディスク上の古いキャッシュを無効にする)
+PLATE_MESH_VERSION = 4
+
+if NUMPY_AVAILABLE:
+    # バイナリSTLの1ファセット (法線, 3頂点, 属性) = 50バイト
+    STL_FACET_DTYPE = np.dtype([
+        ('normal', '<f4', (3,)),
+        ('vertices', '<f4', (3, 3)),
+        ('attr', '<u2'),
+    ])
+    # バイナリPLYの面 (頂点数 + 頂点番号x3) = 13バイト
+    PLY_FACE_DTYPE = np.dtype([
+        ('count', 'u1'),
+        ('indices', '<i4', (3,)),
+    ])
+
+# プロセスプール内で使い回すジェネレータ (キャッシュをプロセス毎に保持)
+_worker_generator = None
+
+
+def _build_plate_file_worker(args):
+    """プロセスプール用: 1プレート分のファイル (STL/3MF/PLY) のバイト列を生成"""
+    global _worker_generator
+    if _worker_generator is None:
+        # キャッシュは親プロセス側で持つ
+        _worker_generator = STLGenerator(cache_max_bytes=0)
+    return bytes(_worker_generator._create_plate_file(*args))
+
+
+def validate_mesh(vertices, faces):
+    """
+    メッシュの検査: 辺の多様体性 (各辺がちょうど2面で逆向きに共有されるか) と体積
+    vertices: [(x, y, z)], faces: [(i1, i2, i3)] (同一座標の頂点は統合済みであること)
+    """
+    edges = {}
+    degenerate_faces = 0
+    for i1, i2, i3 in faces:
+        if i1 == i2 or i2 == i3 or i3 == i1:
+            degenerate_faces += 1
+            continue
+        for a, b in ((i1, i2), (i2, i3), (i3, i1)):
+            edges[(a, b)] = edges.get((a, b), 0) + 1
+
+    boundary_edges = 0
+    non_manifold_edges = 0
+    inconsistent_edges = 0
+    for (a, b), count in edges.items():
+        if a > b and (b, a) in edges:
+            continue
+        reverse = edges.get((b, a), 0)
+        if count + reverse == 1:
+            boundary_edges += 1
+        elif count + reverse > 2:
+            non_manifold_edges += 1
+        elif reverse == 0:
+            # 2面が同じ向きに辺をたどっている (面の向きが揃っていない)
+            inconsistent_edges += 1
+
+    # 原点を頂点とする四面体の符号付き体積の和
+    volume = 0.0
+    for i1, i2, i3 in faces:
+        ax, ay, az = vertices[i1]
+        bx, by, bz = vertices[i2]
+        cx, cy, cz = vertices[i3]
+        volume += ax * (by * cz - bz * cy) - ay * (bx * cz - bz * cx) + az * (bx * cy - by * cx)
+    volume /= 6.0
+
+    return {
+        'vertices': len(vertices),
+        'faces': len(faces),
+        'edges': len(edges),
+        'boundary_edges': boundary_edges,
+        'non_manifold_edges': non_manifold_edges,
+        'inconsistent_edges': inconsistent_edges,
+        'degenerate_faces': degenerate_faces,
+        'watertight': boundary_edges == 0 and non_manifold_edges == 0 and inconsistent_edges == 0 and degenerate_faces == 0,
+        'volume': volume,
+    }
+
+
+def validate_stl(data):
+    """バイナリSTLのバイト列を検査 (同じ座標の頂点を統合してから validate_mesh)"""
+    count = struct.unpack_from('<I', data, 80)[0]
+    if len(data) < 84 + 50 * count:
+        raise ValueError(f"STL is truncated: {count} facets declared, {len(data)} bytes")
+    index = {}
+    faces = []
+    for i in range(count):
+        values = STL_FACET.unpack_from(data, 84 + 50 * i)
+        faces.append(tuple(index.setdefault(values[j:j + 3], len(index)) for j in (3, 6, 9)))
+    return validate_mesh(list(index), faces)
+
+
+class PlateCache:
+    """
+    プレートのファイル内容 (バイト列) のキャッシュ
+    キーはプレート内容と形状設定のハッシュ (STLGenerator._plate_cache_key)。
+    メモリ上は合計バイト数で LRU 破棄し、cache_dir を指定するとディスクにも保存する。
+    ディスク上も合計 disk_max_bytes を超えたら、最後に使った (読み書きした) のが古いファイルから消す。
+    逐次書き込み (writer) はディスクにだけ保存するので、cache_dir が無ければ何も残らない。
+    """
+
+    def __init__(self, max_bytes=PLATE_CACHE_MAX_BYTES, cache_dir=None, disk_max_bytes=PLATE_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key):
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # 使った時刻として更新時刻を進める (ディスクの LRU 破棄用)
+                os.utime(path)
+            except OSError:
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                self.hits += 1
+                return data
+        self.misses += 1
+        return None
+
+    def put(self, key, data):
+        data = bytes(data)
+        self._remember(key, data)
+        if self.cache_dir:
+            with self.writer(key) as f:
+                f.write(data)
+
+    @contextmanager
+    def writer(self, key):
+        """
+        ディスクへ逐次書き込むためのファイル (ディスク保存しない設定なら None)
+        書き込みが最後まで成功した場合のみキャッシュとして置き換える。
+        """
+        if not self.cache_dir:
+            yield None
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f
+            os.replace(tmp_path, self._disk_path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._trim_disk()
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.bin'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def _remember(self, key, data):
+        # 上限より大きいものはメモリには置かない
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _trim_disk(self):
+        """ディスク上の合計が disk_max_bytes 以下になるまで、更新時刻の古いファイルから消す"""
+        files = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.bin'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, path, st.st_size))
+            total += st.st_size
+        files.sort()
+        for _, path, size in files:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + '.bin')
+
+
+class _TeeWriter:
+    """2つのファイルへ同じ内容を書き込む (ストリーミング出力をキャッシュにも保存する)"""
+
+    def __init__(self, *files):
+        self._files = files
+
+    def write(self, data):
+        for f in self._files:
+            f.write(data)
+
 
 class STLGenerator:
+    def __init__(self, cache_max_bytes=PLATE_CACHE_MAX_BYTES, cache_dir=None, cache_disk_max_bytes=PLATE_CACHE_DISK_MAX_BYTES):
+        # (半径, 高さ, 分割数, リング数, 平坦率) -> 原点基準のドーム三角形
+        self._dome_templates = {}
+        # 点字セル64パターン分のメッシュ (ジオメトリ設定が変わったら破棄)
+        self._glyph_key = None
+        self._glyph_blocks = [None] * 64
+        self._glyph_arrays = [None] * 64
+        # 溶着モードのタイル (点パターン・タイル形状毎の三角形分割)
+        self._tile_patterns = {}
+        # 直近の出力の三角形数など (generate_package_from_plates で更新)
+        self.last_export_info = {}
+        # 内容の変わっていないプレートは再出力時に作り直さない (cache_max_bytes=0 かつ cache_dir 無しなら無効)
+        self.plate_cache = None
+        if cache_max_bytes > 0 or cache_dir:
+            self.plate_cache = PlateCache(cache_max_bytes, cache_dir, cache_disk_max_bytes)
+
     def generate_package(self, flat_cells, output_zip_path, max_chars_per_line=10, max_lines_per_plate=1, original_text_str="", base_thickness=1.0):
         """旧メソッド互換用"""
         lines = [flat_cells[i:i + max_chars_per_line] for i in range(0, len(flat_cells), max_chars_per_line)]
         plates = [lines[i:i + max_lines_per_plate] for i in range(0, len(lines), max_lines_per_plate)]
         return self.generate_package_from_plates(plates, output_zip_path, original_text_str, base_thickness)
 
-    def generate_package_from_plates(self, plates_data, output_zip_path, original_text_str="", base_thickness=1.0):
+    def generate_package_from_plates(self, plates_data, output_zip_path, original_text_str="", base_thickness=1.0, engine=ENGINE_PYTHON, streaming=False,
+                                     parallel=False, max_workers=None, executor=None, export_format=FORMAT_STL,
+                                     quality=QUALITY_NORMAL, use_cache=True, bed_size=None, bed_spacing=5.0, welded=False,
+                                     normals=True):
         """
         プレートデータを受け取ってZIP生成
+        engine: メッシュ生成エンジン ("python" または "numpy")
+        export_format: プレートの出力形式 ("stl", "3mf", "ply")
+            3mf / ply は頂点を共有するインデックス付きメッシュで出力する
+        quality: テッセレーション品質 ("draft" / "normal" / "fine" または弦誤差 mm)
+        streaming: True ならSTLを少しずつZIPエントリへ直接書き込む (メモリ節約, STLのみ)
+        parallel: True ならプレート毎のSTLを並列生成 (既定はプロセスプール)
+        max_workers: 並列数 (None ならCPU数)
+        executor: 既存の concurrent.futures.Executor を使う場合に指定
+        並列時もZIPへは plate_NN.stl の順に書き込み、出力は逐次実行と同一。
+        並列時は streaming は無視される (ワーカーからはバイト列で受け取るため)。
+        use_cache: True ならプレートキャッシュにある (内容が同じ) プレートは作り直さない
+            streaming 時に作ったプレートはディスクキャッシュにのみ保存される
+            (cache_dir 無しならキャッシュされない。メモリにある分は streaming 時も使う)。
+        bed_size: (幅, 奥行き) mm を指定するとプレートをベッドへ詰めて並べ、
+            ベッド毎に1つのメッシュ (bed_NN.stl 等) と配置表 bed_layout.json を出力する。
+            この場合 plate_NN は出力せず、parallel とキャッシュは使わない。
+        bed_spacing: ベッド上のプレート同士の間隔 mm
+        welded: True なら点・補強リングをプレート上面に縫い合わせた1つの閉じたメッシュ
+            (スライサーでの修復が不要) で出力する。検査は validate_stl / validate_mesh。
+        normals: False ならSTLの面法線を計算せず (0, 0, 0) のまま書き込む (速度優先)
         """
+        if engine == ENGINE_NUMPY and not NUMPY_AVAILABLE:
+            raise RuntimeError("Module 'numpy' not found (engine='numpy')")
+        if engine not in (ENGINE_PYTHON, ENGINE_NUMPY):
+            raise ValueError(f"Unknown engine: {engine}")
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        tessellation = self._tessellation(quality)
+
         with zipfile.ZipFile(output_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
             zipf.writestr("original_text.txt", original_text_str.encode('utf-8'))
             
+            pages_info = self._pages_info(plates_data)
+
             # BSE出力
-            bse_content = self._generate_bse_content(plates_data)
+            bse_content = self._generate_bse_content(pages_info)
             zipf.writestr("braille.bse", bse_content.encode('utf-8'))
 
-            pages_info = []
-            for i, plate_lines in enumerate(plates_data):
-                page_num = i + 1
-                page_num_dots = self._int_to_braille_dots(page_num)
-                
-                plate_body_dots = []
-                for line in plate_lines:
-                    line_dots = [c['dots'] for c in line]
-                    plate_body_dots.append(line_dots)
-                
-                pages_info.append({
-                    'page_num': page_num,
-                    'plate_lines': plate_lines, 
-                    'page_dots': page_num_dots,
-                    'body_lines_dots': plate_body_dots
-                })
-
             html_content = self._generate_guide_html(pages_info)
             zipf.writestr("guide_sheet.html", html_content.encode('utf-8'))
 
+            # 三角形数は解析的に求まるので、生成前に記録しておく
+            triangle_counts = [
+                self._count_plate_triangles(self._layout_plate(info['body_lines'], info['page_cells'], base_thickness, tessellation, welded))
+                for info in pages_info
+            ]
+            self.last_export_info = {
+                'tessellation': dict(tessellation),
+                'triangles_per_plate': triangle_counts,
+                'total_triangles': sum(triangle_counts),
+            }
+
+            if bed_size is not None:
+                self._write_beds(zipf, pages_info, base_thickness, engine, export_format, tessellation, bed_size, bed_spacing, streaming, welded, normals)
+                return output_zip_path
+
+            cache = self.plate_cache if use_cache else None
             for info in pages_info:
-                stl_filename = f"plate_{info['page_num']:02d}.stl"
-                stl_data = self._create_plate_stl(info['body_lines_dots'], info['page_dots'], base_thickness)
-                zipf.writestr(stl_filename, stl_data)
+                info['cache_key'] = None
+                if cache is not None:
+                    info['cache_key'] = self._plate_cache_key(info['body_lines'], info['page_cells'], base_thickness, export_format, tessellation, welded, normals)
+            regenerated = []
+            self.last_export_info['regenerated_pages'] = regenerated
+
+            if parallel or executor is not None:
+                self._write_plates_parallel(zipf, pages_info, base_thickness, engine, export_format, tessellation, max_workers, executor, cache, welded, normals)
+                return output_zip_path
+
+            for info in pages_info:
+                plate_filename = self._plate_filename(info['page_num'], export_format)
+                plate_data = cache.get(info['cache_key']) if cache is not None else None
+                if plate_data is not None:
+                    self._write_plate_entry(zipf, plate_filename, plate_data, export_format)
+                    continue
+                regenerated.append(info['page_num'])
+                if streaming and export_format == FORMAT_STL:
+                    cache_writer = cache.writer(info['cache_key']) if cache is not None else nullcontext()
+                    with zipf.open(plate_filename, 'w') as f, cache_writer as cache_f:
+                        out = _TeeWriter(f, cache_f) if cache_f is not None else f
+                        self._write_plate_stl(out, info['body_lines'], info['page_cells'], base_thickness, engine, tessellation, welded, normals)
+                else:
+                    plate_data = self._create_plate_file(info['body_lines'], info['page_cells'], base_thickness, engine, export_format, tessellation, welded, normals)
+                    if cache is not None:
+                        cache.put(info['cache_key'], plate_data)
+                    self._write_plate_entry(zipf, plate_filename, plate_data, export_format)
         
         return output_zip_path
 
-    def _generate_bse_content(self, plates_data):
+    def estimate(self, plates_data, base_thickness=1.0, export_format=FORMAT_STL, quality=QUALITY_NORMAL, engine=ENGINE_PYTHON,
+                 original_text_str="", welded=False, normals=True):
+        """
+        出力前の見積もり (メッシュは作らない)
+        三角形数・頂点数・STL/PLY のバイト数は点の数と分割数から正確に求まる。
+        3MF のサイズ・ZIPサイズ・所要時間は実測の係数による目安 (時間は逐次出力の場合)。
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        tessellation = self._tessellation(quality)
+        pages_info = self._pages_info(plates_data)
+
+        plates = []
+        for info in pages_info:
+            layout = self._layout_plate(info['body_lines'], info['page_cells'], base_thickness, tessellation, welded)
+            triangles = self._count_plate_triangles(layout)
+            vertices = self._count_plate_vertices(layout)
+            if export_format == FORMAT_STL:
+                file_bytes = 84 + 50 * triangles
+            elif export_format == FORMAT_PLY:
+                file_bytes = len(self._ply_header(vertices, triangles)) + 12 * vertices + 13 * triangles
+            else:
+                file_bytes = int(THREEMF_BYTES_PER_TRIANGLE * triangles)
+            plates.append({
+                'page_num': info['page_num'],
+                'triangles': triangles,
+                'vertices': vertices,
+                'file_bytes': file_bytes,
+            })
+
+        # テキスト類は小さいので実際に作って圧縮する
+        zip_bytes = 22
+        for name, text in (("original_text.txt", original_text_str), ("braille.bse", self._generate_bse_content(pages_info)),
+                           ("guide_sheet.html", self._generate_guide_html(pages_info))):
+            zip_bytes += ZIP_ENTRY_OVERHEAD + 2 * len(name) + len(zlib.compress(text.encode('utf-8')))
+        ratio = ZIP_COMPRESSION_RATIOS[export_format]
+        if export_format == FORMAT_STL and not normals:
+            ratio = ZIP_COMPRESSION_RATIO_STL_NO_NORMALS
+        for plate in plates:
+            name = self._plate_filename(plate['page_num'], export_format)
+            zip_bytes += ZIP_ENTRY_OVERHEAD + 2 * len(name) + int(plate['file_bytes'] * ratio)
+
+        total_triangles = sum(p['triangles'] for p in plates)
+        return {
+            'tessellation': tessellation,
+            'plates': plates,
+            'total_triangles': total_triangles,
+            'total_file_bytes': sum(p['file_bytes'] for p in plates),
+            'zip_bytes': zip_bytes,
+            'seconds': total_triangles * EXPORT_SECONDS_PER_TRIANGLE[(engine, export_format)],
+        }
+
+    def _pages_info(self, plates_data):
+        pages_info = []
+        for i, plate_lines in enumerate(plates_data):
+            page_num = i + 1
+            plate_lines = [self._cell_line(line) for line in plate_lines]
+            pages_info.append({
+                'page_num': page_num,
+                'plate_lines': plate_lines, 
+                'page_cells': self._page_number_cells(page_num),
+                'body_lines': [line.cells for line in plate_lines]
+            })
+        return pages_info
+
+    def _cell_line(self, line):
+        """
+        1行分の入力を CellLine (セル列 bytes, 表示用文字) にそろえる
+        CellLine の他、セル列 (bytes / 整数のリスト) と旧形式の辞書のリストも受け付ける。
+        """
+        if isinstance(line, CellLine):
+            return line
+        if isinstance(line, (bytes, bytearray)) or (line and isinstance(line[0], int)):
+            return CellLine(bytes(line), ('',) * len(line))
+        return CellLine(*cells_from_legacy(line))
+
+    def _write_beds(self, zipf, pages_info, base_thickness, engine, export_format, tessellation, bed_size, bed_spacing, streaming=False, welded=False, normals=True):
+        """プレートをベッドへ詰めて、ベッド毎のメッシュと配置表を書き込む"""
+        bed_width, bed_depth = (float(v) for v in bed_size)
+        if bed_width <= 0 or bed_depth <= 0 or bed_spacing < 0:
+            raise ValueError(f"Invalid bed size / spacing: {bed_size}, {bed_spacing}")
+        layouts = [self._layout_plate(info['body_lines'], info['page_cells'], base_thickness, tessellation, welded) for info in pages_info]
+        beds = self._pack_beds([(layout['width'], layout['height']) for layout in layouts], bed_width, bed_depth, bed_spacing)
+
+        manifest = {
+            'bed_size': [bed_width, bed_depth],
+            'spacing': bed_spacing,
+            'format': export_format,
+            'beds': [],
+        }
+        for bed_num, items in enumerate(beds, 1):
+            filename = f"bed_{bed_num:02d}.{export_format}"
+            placed = [self._place_layout(layouts[i], x, y) for i, x, y in items]
+            if streaming and export_format == FORMAT_STL:
+                with zipf.open(filename, 'w') as f:
+                    self._write_mesh_stl(f, placed, engine, normals)
+            else:
+                self._write_plate_entry(zipf, filename, self._create_mesh_file(placed, engine, export_format, normals), export_format)
+            manifest['beds'].append({
+                'file': filename,
+                'triangles': sum(self.last_export_info['triangles_per_plate'][i] for i, x, y in items),
+                'plates': [{
+                    'page_num': pages_info[i]['page_num'],
+                    'x': round(x, 3), 'y': round(y, 3),
+                    'width': round(layouts[i]['width'], 3), 'height': round(layouts[i]['height'], 3),
+                } for i, x, y in items],
+            })
+        zipf.writestr("bed_layout.json", json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+        self.last_export_info['beds'] = manifest['beds']
+        self.last_export_info['regenerated_pages'] = [info['page_num'] for info in pages_info]
+
+    def _plate_filename(self, page_num, export_format=FORMAT_STL):
+        return f"plate_{page_num:02d}.{export_format}"
+
+    def _write_plate_entry(self, zipf, filename, data, export_format=FORMAT_STL):
+        # 3MF はそれ自体がZIPなので二重圧縮しない
+        compress_type = zipfile.ZIP_STORED if export_format == FORMAT_3MF else None
+        zipf.writestr(filename, data, compress_type=compress_type)
+
+    def _write_plates_parallel(self, zipf, pages_info, base_thickness, engine, export_format=FORMAT_STL, tessellation=None, max_workers=None, executor=None, cache=None, welded=False, normals=True):
+        """各プレートのファイルを並列に生成し、ページ順にZIPへ書き込む (キャッシュにあるものは生成しない)"""
+        cached = [cache.get(info['cache_key']) if cache is not None else None for info in pages_info]
+        jobs = [(info['body_lines'], info['page_cells'], base_thickness, engine, export_format, tessellation, welded, normals)
+                for info, data in zip(pages_info, cached) if data is None]
+        own_executor = executor is None and bool(jobs)
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            # map は投入順に結果を返すので、ZIP内の並びは逐次実行と変わらない
+            results = executor.map(_build_plate_file_worker, jobs) if jobs else iter(())
+            for info, plate_data in zip(pages_info, cached):
+                if plate_data is None:
+                    plate_data = next(results)
+                    self.last_export_info['regenerated_pages'].append(info['page_num'])
+                    if cache is not None:
+                        cache.put(info['cache_key'], plate_data)
+                self._write_plate_entry(zipf, self._plate_filename(info['page_num'], export_format), plate_data, export_format)
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+    def _plate_cache_key(self, body_lines, page_cells, base_thickness, export_format, tessellation, welded=False, normals=True):
+        """プレートキャッシュのキー: 点の並び・ページ番号・厚み・出力形式・分割数のハッシュ"""
+        h = hashlib.sha256()
+        h.update(f"v{PLATE_MESH_VERSION}|{export_format}|{float(base_thickness)!r}|{bool(welded)}|{bool(normals)}|".encode('ascii'))
+        h.update(repr(sorted(tessellation.items())).encode('ascii'))
+        # セルは6ビットのパターン1バイト、行の区切りは 0xFF
+        h.update(b'|' + bytes(page_cells) + b'|')
+        for line in body_lines:
+            h.update(bytes(line) + b'\xff')
+        return h.hexdigest()
+
+    def _generate_bse_content(self, pages_info):
         """BSE形式(Braille ASCII)に変換"""
         ascii_map = {
             0x00: ' ', 0x01: 'a', 0x03: 'b', 0x09: 'c', 0x19: 'd', 0x11: 'e',
@@ -65,31 +581,215 @@ class STLGenerator:
         }
 
         bse_lines = []
-        for plate in plates_data:
-            for line_cells in plate:
-                line_str = ""
-                for cell in line_cells:
-                    dots = cell['dots']
-                    val = 0
-                    if dots[0]: val += 1
-                    if dots[1]: val += 2
-                    if dots[2]: val += 4
-                    if dots[3]: val += 8
-                    if dots[4]: val += 16
-                    if dots[5]: val += 32
-                    line_str += ascii_map.get(val, '?')
-                bse_lines.append(line_str)
+        for info in pages_info:
+            for line in info['plate_lines']:
+                bse_lines.append("".join([ascii_map.get(cell, '?') for cell in line.cells]))
             bse_lines.append("") 
         return "\r\n".join(bse_lines)
 
-    def _int_to_braille_dots(self, n):
-        s = str(n)
-        dots = [NUM_INDICATOR]
-        for char in s:
-             dots.append(BRAILLE_MAP.get(char, SPACE_MARK))
-        return dots
+    def _page_number_cells(self, n):
+        """ページ番号 -> 数符 + 数字のセル列"""
+        return bytes([NUM_INDICATOR] + [BRAILLE_MAP.get(char, SPACE_MARK) for char in str(n)])
+
+    def _tessellation(self, quality=QUALITY_NORMAL):
+        """
+        品質指定 -> 各部の分割数
+        数値の場合は弦誤差 (円弧と弦の最大距離, mm) がそれ以下になる最小の分割数を使う。
+        """
+        if isinstance(quality, str):
+            if quality not in QUALITY_PRESETS:
+                raise ValueError(f"Unknown quality: {quality}")
+            return dict(QUALITY_PRESETS[quality])
+
+        chord_error = float(quality)
+        if chord_error <= 0:
+            raise ValueError("quality (chord error) must be positive")
+
+        def circle_segments(radius, minimum):
+            if chord_error >= radius:
+                return minimum
+            return max(minimum, math.ceil(math.pi / math.acos(1 - chord_error / radius)))
+
+        # 寸法は _layout_plate と同じ (角R 3.0, 穴の補強リング外径 4.0, 点の半径 0.8)
+        dot_segments = circle_segments(0.8, 6)
+        # ドームの子午線は半径0.8の円弧の 1/8 周 (平坦率0.5) 相当
+        dot_rings = max(1, math.ceil(circle_segments(0.8, 8) / 8))
+        return {
+            'corner_segments': max(1, math.ceil(circle_segments(3.0, 4) / 4)),
+            'tube_segments': circle_segments(4.0, 8),
+            'dot_segments': dot_segments,
+            'dot_rings': dot_rings,
+        }
+
+    def _create_plate_file(self, body_lines, page_cells, base_thickness=1.0, engine=ENGINE_PYTHON, export_format=FORMAT_STL, tessellation=None, welded=False, normals=True):
+        """出力形式に応じて1プレート分のファイル内容を生成"""
+        layout = self._layout_plate(body_lines, page_cells, base_thickness, tessellation, welded)
+        return self._create_mesh_file([layout], engine, export_format, normals)
+
+    def _create_plate_stl(self, body_lines, page_cells, base_thickness=1.0, engine=ENGINE_PYTHON, tessellation=None, welded=False, normals=True):
+        return self._create_plate_file(body_lines, page_cells, base_thickness, engine, FORMAT_STL, tessellation, welded, normals)
 
-    def _create_plate_stl(self, body_lines_dots, page_num_dots, base_thickness=1.0):
+    def _write_plate_stl(self, f, body_lines, page_cells, base_thickness=1.0, engine=ENGINE_PYTHON, tessellation=None, welded=False, normals=True):
+        layout = self._layout_plate(body_lines, page_cells, base_thickness, tessellation, welded)
+        self._write_mesh_stl(f, [layout], engine, normals)
+
+    def _create_mesh_file(self, layouts, engine=ENGINE_PYTHON, export_format=FORMAT_STL, normals=True):
+        """配置済みプレート (1枚以上) を1つのメッシュとしてファイル内容を生成"""
+        if export_format == FORMAT_STL:
+            buf = io.BytesIO()
+            self._write_mesh_stl(buf, layouts, engine, normals)
+            return buf.getvalue()
+
+        vertices, faces = self._build_indexed_mesh(layouts[0], engine)
+        if len(layouts) > 1:
+            vertices, faces = self._merge_indexed_meshes(
+                [(vertices, faces)] + [self._build_indexed_mesh(layout, engine) for layout in layouts[1:]])
+        if export_format == FORMAT_PLY:
+            return self._encode_ply(vertices, faces)
+        return self._encode_3mf(vertices, faces)
+
+    def _write_mesh_stl(self, f, layouts, engine=ENGINE_PYTHON, normals=True):
+        """
+        STLをファイルオブジェクトへ逐次書き込み
+        三角形数は先に解析的に求めるので、メッシュ全体をメモリに持たない。
+        """
+        f.write(STL_HEADER)
+        f.write(struct.pack('<I', sum(self._count_plate_triangles(layout) for layout in layouts)))
+        for layout in layouts:
+            for chunk in self._iter_plate_stl_chunks(layout, engine, normals):
+                f.write(chunk)
+
+    def _merge_indexed_meshes(self, meshes):
+        """(頂点, 面) の組を1つのメッシュにまとめる (面の頂点番号をずらす)"""
+        if NUMPY_AVAILABLE and isinstance(meshes[0][0], np.ndarray):
+            offsets = np.cumsum([0] + [len(v) for v, f in meshes[:-1]])
+            return (np.concatenate([v for v, f in meshes]),
+                    np.concatenate([f + offset for (v, f), offset in zip(meshes, offsets)]))
+        vertices = []
+        faces = []
+        for mesh_vertices, mesh_faces in meshes:
+            offset = len(vertices)
+            vertices.extend(mesh_vertices)
+            faces.extend((offset + i1, offset + i2, offset + i3) for i1, i2, i3 in mesh_faces)
+        return vertices, faces
+
+    def _count_plate_triangles(self, layout):
+        """点の数と外形の分割数から三角形数を計算 (メッシュは作らない)"""
+        outer_points = 4 * (layout['corner_segments'] + 1)
+        hole_points = layout['tube_segments']
+        if layout['welded']:
+            # 穴あき多角形 (点 n 個, 穴 h 個) の耳刈りは全ての点を使い面積ゼロの三角形を作らないので n + 2h - 2 個
+            # 本体 (底面 + 側面) + 補強リング
+            base = (outer_points + hole_points) * 3 + layout['tube_segments'] * 6
+            # 上面: 外形・補強リング外周・本文の格子の外周・ページ番号の矩形
+            top_points = outer_points + layout['tube_segments'] + sum(len(hole) for hole in layout['top_holes'])
+            base += top_points + 2 * (1 + len(layout['top_holes'])) - 2
+            # タイル: 矩形 (4点) から点の底面の円を除く
+            dot_count = sum(bin(cell).count('1') for cell, x, y in layout['cells'])
+            tiles = len(layout['tiles']) + len(layout['empty_tiles'])
+            base += 2 * tiles + dot_count * (layout['dot_segments'] + 2)
+            return base + dot_count * self._triangles_per_dot(layout)
+
+        # 本体 (上下面 + 側面) + 補強リング
+        base = (outer_points + hole_points) * 4 + layout['tube_segments'] * 6
+        dot_count = 0
+        for cell, x, y in layout['cells']:
+            dot_count += bin(cell).count('1')
+        return base + dot_count * self._triangles_per_dot(layout)
+
+    def _count_plate_vertices(self, layout):
+        """インデックス付きメッシュ (3MF / PLY) の頂点数"""
+        outer_points = 4 * (layout['corner_segments'] + 1)
+        # 本体の上下面 (外形 + 穴) + 補強リング (内周下端は本体の穴と共有)
+        base = 2 * (outer_points + layout['tube_segments']) + 3 * layout['tube_segments']
+        if layout['welded']:
+            # タイルの角 (本文の格子点 + ページ番号の矩形)
+            page_tiles = len(layout['top_holes']) - (1 if layout['grid_points'] else 0)
+            base += layout['grid_points'] + 4 * page_tiles
+        dot_count = 0
+        for cell, x, y in layout['cells']:
+            dot_count += bin(cell).count('1')
+        # 点1つ = 底面を含むリング (rings + 1) 本 + 頂点
+        return base + dot_count * (layout['dot_segments'] * (layout['dot_rings'] + 1) + 1)
+
+    def _triangles_per_dot(self, layout):
+        return layout['dot_segments'] * (2 * layout['dot_rings'] + 1)
+
+    def _iter_plate_stl_chunks(self, layout, engine=ENGINE_PYTHON, normals=True):
+        """台座 -> セル (STREAM_BATCH_TRIANGLES 程度ずつ) の順にSTL本体のバイト列を返す"""
+        base = []
+        self._add_plate_base(base, layout)
+        if engine == ENGINE_NUMPY:
+            yield self._pack_triangles_numpy(np.array([t[1:] for t in base], dtype=np.float64), normals)
+        else:
+            yield self._pack_triangles(base, normals)
+
+        per_dot = self._triangles_per_dot(layout)
+        tiles = layout['tiles'] if layout['welded'] else None
+        batch = []
+        batch_start = 0
+        batch_tris = 0
+        for i, cell in enumerate(layout['cells']):
+            batch.append(cell)
+            batch_tris += bin(cell[0]).count('1') * per_dot
+            if batch_tris >= STREAM_BATCH_TRIANGLES:
+                yield self._pack_cells(batch, layout, engine, tiles and tiles[batch_start:i + 1], normals)
+                batch = []
+                batch_start = i + 1
+                batch_tris = 0
+        if batch:
+            yield self._pack_cells(batch, layout, engine, tiles and tiles[batch_start:], normals)
+
+    def _pack_cells(self, cells, layout, engine, tiles=None, normals=True):
+        """セル群のSTL本体 (溶着モードでは先にセル周りのタイル、続いて点)"""
+        tile_triangles = []
+        if tiles:
+            for (cell, x, y), tile in zip(cells, tiles):
+                self._add_tile(tile_triangles, cell, tile, x, y, layout)
+
+        if engine == ENGINE_NUMPY:
+            tris = self._cells_array(cells, layout)
+            if tile_triangles:
+                tile_array = np.array([t[1:] for t in tile_triangles], dtype=np.float64)
+                tris = tile_array if tris is None else np.concatenate([tile_array, tris])
+            return self._pack_triangles_numpy(tris, normals) if tris is not None else b''
+
+        triangles = tile_triangles
+        z_base = layout['thickness']
+        glyph_args = self._glyph_args(layout)
+        for cell, x, y in cells:
+            self._add_braille_char(triangles, cell, x, y, z_base, *glyph_args)
+        return self._pack_triangles(triangles, normals)
+
+    def _pack_triangles(self, triangles, normals=True):
+        pack = STL_FACET.pack
+        if not normals:
+            return b''.join([pack(0.0, 0.0, 0.0, *v1, *v2, *v3, 0) for normal, v1, v2, v3 in triangles])
+
+        # 面法線 = (v2 - v1) x (v3 - v1) を正規化 (面積ゼロなら 0)。NumPy版と同じ演算順
+        sqrt = math.sqrt
+        data = []
+        for normal, (ax, ay, az), (bx, by, bz), (cx, cy, cz) in triangles:
+            ux = bx - ax; uy = by - ay; uz = bz - az
+            vx = cx - ax; vy = cy - ay; vz = cz - az
+            nx = uy * vz - uz * vy
+            ny = uz * vx - ux * vz
+            nz = ux * vy - uy * vx
+            length = sqrt(nx * nx + ny * ny + nz * nz)
+            if length > 0:
+                nx /= length; ny /= length; nz /= length
+            else:
+                nx = ny = nz = 0.0
+            data.append(pack(nx, ny, nz, ax, ay, az, bx, by, bz, cx, cy, cz, 0))
+        return b''.join(data)
+
+    def _layout_plate(self, body_lines, page_cells, base_thickness=1.0, tessellation=None, welded=False):
+        """
+        プレート寸法と各セルの配置位置を計算 (メッシュは作らない)
+        welded: 点・補強リングをプレート上面に縫い合わせた1つの閉じたメッシュにする
+        """
+        if tessellation is None:
+            tessellation = QUALITY_PRESETS[QUALITY_NORMAL]
         # 寸法 (平坦化対応)
         DOT_BASE_DIA = 1.6
         DOT_HEIGHT = 0.75
@@ -109,12 +809,12 @@ class STLGenerator:
         HOLE_RADIUS = HOLE_DIA / 2
         HOLE_RING_WIDTH = 1.5 
         
-        LEFT_SIDE_WIDTH = max(HOLE_DIA + HOLE_RING_WIDTH*2 + 4.0, len(page_num_dots) * CHAR_PITCH)
+        LEFT_SIDE_WIDTH = max(HOLE_DIA + HOLE_RING_WIDTH*2 + 4.0, len(page_cells) * CHAR_PITCH)
         if LEFT_SIDE_WIDTH < 15.0: LEFT_SIDE_WIDTH = 15.0
 
-        num_lines = len(body_lines_dots)
+        num_lines = len(body_lines)
         max_line_chars = 0
-        for line in body_lines_dots:
+        for line in body_lines:
             max_line_chars = max(max_line_chars, len(line))
         body_width = max_line_chars * CHAR_PITCH
         
@@ -125,28 +825,15 @@ class STLGenerator:
         if total_height < min_height_for_hole:
             total_height = min_height_for_hole
 
-        triangles = []
-
         hole_cx = MARGIN_LEFT + (HOLE_RADIUS + HOLE_RING_WIDTH)
         hole_cy = total_height - (MARGIN_TOP + HOLE_RADIUS + HOLE_RING_WIDTH)
-        
-        self._add_plate_with_hole(
-            triangles, 
-            width=total_width, height=total_height, depth=BASE_THICKNESS, 
-            corner_radius=3.0, 
-            hole_cx=hole_cx, hole_cy=hole_cy, hole_r=HOLE_RADIUS
-        )
 
-        self._add_tube(
-            triangles, 
-            cx=hole_cx, cy=hole_cy, z_base=BASE_THICKNESS, 
-            r_inner=HOLE_RADIUS, r_outer=HOLE_RADIUS + HOLE_RING_WIDTH, 
-            height=DOT_HEIGHT
-        )
+        # (点パターン, x, y) をSTLへの出力順に並べる
+        cells = []
 
         page_num_y = MARGIN_BOTTOM + LINE_HEIGHT/2 
         page_num_x = MARGIN_LEFT
-        page_content_width = len(page_num_dots) * CHAR_PITCH
+        page_content_width = len(page_cells) * CHAR_PITCH
         if page_content_width < LEFT_SIDE_WIDTH:
             page_num_x += (LEFT_SIDE_WIDTH - page_content_width) / 2
             
@@ -154,73 +841,612 @@ class STLGenerator:
         current_x = page_num_x
         pg_y = page_num_y - dots_center_y_offset 
 
-        if len(body_lines_dots) > 1:
-            for char_dots in page_num_dots:
-                self._add_braille_char(triangles, char_dots, current_x, pg_y, BASE_THICKNESS, DOT_BASE_DIA, DOT_HEIGHT, DOT_PITCH_X, DOT_PITCH_Y)
+        # 溶着モード用: 上面をセル毎の矩形 (タイル) に分ける
+        # tiles は cells と同じ順の 4隅 (左下, 右下, 右上, 左上)
+        tiles = []
+        cell_w = DOT_PITCH_X + DOT_BASE_DIA
+        cell_h = DOT_PITCH_Y * 2 + DOT_BASE_DIA
+
+        if len(body_lines) > 1:
+            for cell in page_cells:
+                cells.append((cell, current_x, pg_y))
+                # ページ番号は点の外形 + 0.5mm の矩形
+                x0, y0 = current_x - 0.5, pg_y - 0.5
+                x1, y1 = current_x + cell_w + 0.5, pg_y + cell_h + 0.5
+                tiles.append(((x0, y0), (x1, y0), (x1, y1), (x0, y1)))
                 current_x += CHAR_PITCH
+        page_tiles = list(tiles)
 
         body_start_x = MARGIN_LEFT + LEFT_SIDE_WIDTH
         first_line_center_y = total_height - MARGIN_TOP - LINE_HEIGHT/2
-        
-        for i, line_dots in enumerate(body_lines_dots):
+
+        # 本文は CHAR_PITCH x LINE_PITCH の格子 (セルの中心が升目の中心) で隙間なく敷き詰める
+        grid_x = [body_start_x - (CHAR_PITCH - cell_w) / 2 + j * CHAR_PITCH for j in range(max_line_chars + 1)]
+        grid_y = [first_line_center_y + LINE_PITCH / 2 - i * LINE_PITCH for i in range(num_lines + 1)]
+
+        def grid_tile(i, j):
+            return ((grid_x[j], grid_y[i + 1]), (grid_x[j + 1], grid_y[i + 1]), (grid_x[j + 1], grid_y[i]), (grid_x[j], grid_y[i]))
+
+        empty_tiles = []
+        for i, line_cells in enumerate(body_lines):
             line_center_y = first_line_center_y - (i * LINE_PITCH)
             line_y = line_center_y - dots_center_y_offset
             
             line_x = body_start_x
-            for char_dots in line_dots:
-                self._add_braille_char(triangles, char_dots, line_x, line_y, BASE_THICKNESS, DOT_BASE_DIA, DOT_HEIGHT, DOT_PITCH_X, DOT_PITCH_Y)
+            for j, cell in enumerate(line_cells):
+                cells.append((cell, line_x, line_y))
+                tiles.append(grid_tile(i, j))
                 line_x += CHAR_PITCH
+            for j in range(len(line_cells), max_line_chars):
+                empty_tiles.append(grid_tile(i, j))
 
-        header = b'Tenji P-Fab Generated STL' + b'\0' * (80 - 25)
-        num_tris = len(triangles)
-        
-        data = bytearray()
-        data.extend(header)
-        data.extend(struct.pack('<I', num_tris))
-        
-        for normal, v1, v2, v3 in triangles:
-            data.extend(struct.pack('<3f', 0.0, 0.0, 0.0)) 
-            data.extend(struct.pack('<3f', *v1))
-            data.extend(struct.pack('<3f', *v2))
-            data.extend(struct.pack('<3f', *v3))
-            data.extend(struct.pack('<H', 0))
-            
-        return data
+        # 上面からタイルを除いた残りの穴 (本文の格子の外周, ページ番号の矩形)
+        top_holes = []
+        if max_line_chars > 0:
+            top_holes.append(
+                [(x, grid_y[-1]) for x in grid_x[:-1]] +
+                [(grid_x[-1], y) for y in grid_y[:0:-1]] +
+                [(x, grid_y[0]) for x in grid_x[:0:-1]] +
+                [(grid_x[0], y) for y in grid_y[:-1]])
+        top_holes.extend(list(tile) for tile in page_tiles)
+
+        return {
+            'width': total_width,
+            'height': total_height,
+            'thickness': BASE_THICKNESS,
+            'corner_radius': 3.0,
+            'hole_cx': hole_cx,
+            'hole_cy': hole_cy,
+            'hole_r': HOLE_RADIUS,
+            'hole_ring_width': HOLE_RING_WIDTH,
+            'dot_dia': DOT_BASE_DIA,
+            'dot_height': DOT_HEIGHT,
+            'dot_pitch_x': DOT_PITCH_X,
+            'dot_pitch_y': DOT_PITCH_Y,
+            'corner_segments': tessellation['corner_segments'],
+            'tube_segments': tessellation['tube_segments'],
+            'dot_segments': tessellation['dot_segments'],
+            'dot_rings': tessellation['dot_rings'],
+            'cells': cells,
+            'welded': welded,
+            'tiles': tiles,
+            'empty_tiles': empty_tiles,
+            'top_holes': top_holes,
+            'grid_points': len(grid_x) * len(grid_y) if max_line_chars > 0 else 0,
+        }
+
+    def _place_layout(self, layout, x, y):
+        """プレートを (x, y) へ平行移動した配置 (台座は _add_plate_base で, セルは位置をずらす)"""
+        placed = dict(layout)
+        placed['origin'] = (x, y)
+        placed['cells'] = [(cell, cx + x, cy + y) for cell, cx, cy in layout['cells']]
+        return placed
+
+    def _pack_beds(self, sizes, bed_width, bed_depth, spacing):
+        """
+        プレートの矩形をベッドへ詰める (棚詰め・高さ降順の First Fit)
+        sizes: [(幅, 奥行き)], 戻り値: ベッド毎の [(プレート番号, x, y)]
+        """
+        beds = []  # {'shelves': [[y, 高さ, 使用済み幅]], 'used': 使用済み奥行き, 'items': [...]}
+        order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+        for i in order:
+            w, h = sizes[i]
+            if w > bed_width or h > bed_depth:
+                raise ValueError(f"Plate {i + 1} ({w:.1f} x {h:.1f} mm) does not fit on the bed ({bed_width} x {bed_depth} mm)")
+            placed = False
+            for bed in beds:
+                for shelf in bed['shelves']:
+                    x = shelf[2] + spacing if shelf[2] else 0.0
+                    if h <= shelf[1] and x + w <= bed_width:
+                        bed['items'].append((i, x, shelf[0]))
+                        shelf[2] = x + w
+                        placed = True
+                        break
+                if placed:
+                    break
+                y = bed['used'] + spacing
+                if y + h <= bed_depth:
+                    bed['shelves'].append([y, h, w])
+                    bed['used'] = y + h
+                    bed['items'].append((i, 0.0, y))
+                    placed = True
+                    break
+            if not placed:
+                beds.append({'shelves': [[0.0, h, w]], 'used': h, 'items': [(i, 0.0, 0.0)]})
+        return [sorted(bed['items']) for bed in beds]
+
+    def _add_plate_base(self, triangles, layout):
+        """台座 (穴あきプレート + 穴の補強リング)"""
+        ox, oy = layout.get('origin', (0.0, 0.0))
+        if ox or oy:
+            # ベッド上に配置したプレート: 原点で作ってから平行移動
+            base = []
+            self._add_plate_base(base, dict(layout, origin=(0.0, 0.0)))
+            triangles.extend(
+                (n, (a[0] + ox, a[1] + oy, a[2]), (b[0] + ox, b[1] + oy, b[2]), (c[0] + ox, c[1] + oy, c[2]))
+                for n, a, b, c in base)
+            return
+
+        if layout['welded']:
+            self._add_welded_base(triangles, layout)
+            return
+
+        self._add_plate_with_hole(
+            triangles, 
+            width=layout['width'], height=layout['height'], depth=layout['thickness'], 
+            corner_radius=layout['corner_radius'], 
+            hole_cx=layout['hole_cx'], hole_cy=layout['hole_cy'], hole_r=layout['hole_r'],
+            segments=layout['corner_segments'], hole_segments=layout['tube_segments']
+        )
+
+        self._add_tube(
+            triangles, 
+            cx=layout['hole_cx'], cy=layout['hole_cy'], z_base=layout['thickness'], 
+            r_inner=layout['hole_r'], r_outer=layout['hole_r'] + layout['hole_ring_width'], 
+            height=layout['dot_height'], segments=layout['tube_segments']
+        )
+
+    def _add_welded_base(self, triangles, layout):
+        """
+        溶着モードの台座: 底面・側面・穴の内壁・補強リング + 上面のうちタイル以外の部分
+        上面は補強リングの外周・本文の格子・ページ番号の矩形を穴として三角形分割する。
+        補強リングの外周と内周は本体の上面・穴の内壁と同じ座標の点で接続される。
+        """
+        depth = layout['thickness']
+        self._add_plate_with_hole(
+            triangles,
+            width=layout['width'], height=layout['height'], depth=depth,
+            corner_radius=layout['corner_radius'],
+            hole_cx=layout['hole_cx'], hole_cy=layout['hole_cy'], hole_r=layout['hole_r'],
+            segments=layout['corner_segments'], hole_segments=layout['tube_segments'], top=False
+        )
+        cx, cy = layout['hole_cx'], layout['hole_cy']
+        r_outer = layout['hole_r'] + layout['hole_ring_width']
+        self._add_tube(
+            triangles,
+            cx=cx, cy=cy, z_base=depth,
+            r_inner=layout['hole_r'], r_outer=r_outer,
+            height=layout['dot_height'], segments=layout['tube_segments']
+        )
+
+        # 補強リング外周の点は _add_tube と同じ式で求める
+        segments = layout['tube_segments']
+        tube_points = []
+        for i in range(segments):
+            ang = 2 * math.pi * i / segments
+            tube_points.append((cx + r_outer * math.cos(ang), cy + r_outer * math.sin(ang)))
+        outer_points = self._generate_rounded_rect_path(layout['width'], layout['height'], layout['corner_radius'], layout['corner_segments'])
+        for p1, p2, p3 in self._triangulate_with_holes(outer_points, [tube_points] + layout['top_holes']):
+            triangles.append(((0,0,1), (p1[0], p1[1], depth), (p2[0], p2[1], depth), (p3[0], p3[1], depth)))
+
+        # 文字のない升目 (行末の空き) も平らなタイルで埋める
+        for tile in layout['empty_tiles']:
+            self._add_tile(triangles, 0, tile, tile[0][0], tile[0][1], layout)
+
+    def _add_tile(self, triangles, mask, tile, x, y, layout):
+        """
+        セル周りのタイル (矩形から点の底面の円を除いた上面)
+        タイルの角は layout の座標をそのまま、円周の点はグリフブロックと同じ計算で求めるので、
+        隣のタイル・上面の残り・点のドームと同じ座標の頂点で接続される。
+        """
+        ox, oy = layout.get('origin', (0.0, 0.0))
+        corners = [(tx + ox, ty + oy) for tx, ty in tile] if ox or oy else tile
+        ring_points, faces = self._layout_tile_pattern(layout, mask, tile, x, y)
+        z = layout['thickness']
+        pts = [(tx, ty, z) for tx, ty in corners]
+        pts.extend((x + gx, y + gy, z + 0.0) for gx, gy in ring_points)
+        for i1, i2, i3 in faces:
+            triangles.append(((0,0,1), pts[i1], pts[i2], pts[i3]))
+
+    def _layout_tile_pattern(self, layout, mask, tile, x, y):
+        # タイルの角は配置前の座標なので、セル位置も配置前に戻して型を引く
+        ox, oy = layout.get('origin', (0.0, 0.0))
+        return self._tile_pattern(mask, tile, x - ox, y - oy, self._glyph_args(layout))
+
+    def _tile_pattern(self, mask, tile, x, y, glyph_args):
+        """
+        タイルの三角形分割の型 (点パターン・タイルの形毎にキャッシュ)
+        戻り値: (セル原点基準の円周の点, 面の頂点番号)。頂点番号 0-3 はタイルの角。
+        """
+        # 型はセル原点基準の矩形で引く (丸めて同じ形のタイルをまとめる)
+        rect = tuple((round(tx - x, 6), round(ty - y, 6)) for tx, ty in tile)
+        key = (mask, rect) + glyph_args
+        pattern = self._tile_patterns.get(key)
+        if pattern is None:
+            dia, height, px, py, segments, rings = glyph_args
+            template_vertices, _ = self._dome_template(dia/2, height, segments, rings)
+            # ドームの底面の輪 (z = 0) をグリフブロックと同じ位置に置く
+            base_ring = [(vx, vy) for vx, vy, vz in template_vertices if vz == 0.0]
+            offsets = [
+                (0, 2*py), (0, py), (0, 0),
+                (px, 2*py), (px, py), (px, 0)
+            ]
+            index = {p: i for i, p in enumerate(rect)}
+            ring_points = []
+            holes = []
+            for i, (dx, dy) in enumerate(offsets):
+                if mask & (1 << i):
+                    hole = [(dx + dia/2 + vx, dy + dia/2 + vy) for vx, vy in base_ring]
+                    for p in hole:
+                        index[p] = 4 + len(ring_points)
+                        ring_points.append(p)
+                    holes.append(hole)
+            faces = tuple((index[p1], index[p2], index[p3]) for p1, p2, p3 in self._triangulate_with_holes(list(rect), holes))
+            pattern = (tuple(ring_points), faces)
+            self._tile_patterns[key] = pattern
+        return pattern
+
+    def _glyph_args(self, layout):
+        """グリフブロックのキャッシュキー (点の直径, 高さ, ピッチX, ピッチY, 分割数, リング数)"""
+        return (layout['dot_dia'], layout['dot_height'], layout['dot_pitch_x'], layout['dot_pitch_y'],
+                layout['dot_segments'], layout['dot_rings'])
+
+    # --- NumPyエンジン ---
+    # 三角形を (N, 3, 3) の float64 配列として組み立て、最後に float32 の
+    # 構造化配列へ詰めて tobytes() 1回で本体を出力する。
+    # 座標は python エンジンと同じブロック・同じ演算で求めるのでバイト単位で一致する。
+
+    def _cells_array(self, cells, layout):
+        """セル群の三角形 (M, 3, 3)。セルのブロックを集めて原点分ずらすだけ"""
+        glyph_args = self._glyph_args(layout)
+        blocks = []
+        origins = []
+        counts = []
+        for cell, x, y in cells:
+            block = self._glyph_array(cell, *glyph_args)
+            if len(block):
+                blocks.append(block)
+                origins.append((x, y, layout['thickness']))
+                counts.append(len(block))
+        if not blocks:
+            return None
+        offsets = np.repeat(np.array(origins, dtype=np.float64), counts, axis=0)
+        return np.concatenate(blocks) + offsets[:, None, :]
+
+    def _glyph_array(self, mask, dia, height, px, py, segments=DOT_SEGMENTS, rings=DOT_RINGS):
+        """セル1個分の三角形 (T, 3, 3)。セル原点基準"""
+        return self._glyph_numpy(mask, dia, height, px, py, segments, rings)[0]
+
+    def _glyph_indexed_array(self, mask, dia, height, px, py, segments=DOT_SEGMENTS, rings=DOT_RINGS):
+        """セル1個分の (頂点 (V, 3), 面 (F, 3))。セル原点基準"""
+        return self._glyph_numpy(mask, dia, height, px, py, segments, rings)[1:]
+
+    def _glyph_numpy(self, mask, dia, height, px, py, segments=DOT_SEGMENTS, rings=DOT_RINGS):
+        self._glyph_block(mask, dia, height, px, py, segments, rings)
+        arrays = self._glyph_arrays[mask]
+        if arrays is None:
+            vertices, faces = self._glyph_blocks[mask]
+            vertex_array = np.array(vertices, dtype=np.float64).reshape(-1, 3)
+            face_array = np.array([f[1:] for f in faces], dtype=np.int64).reshape(-1, 3)
+            arrays = (vertex_array[face_array], vertex_array, face_array)
+            self._glyph_arrays[mask] = arrays
+        return arrays
+
+    # --- インデックス付きメッシュ (3MF / PLY) ---
+    # 台座は同一座標の頂点を統合し、セルは重複除去済みのグリフブロックをそのまま並べる。
+    # (点同士・点と台座は頂点を共有しない形状なので、これで全体の重複もなくなる)
+
+    def _build_indexed_mesh(self, layout, engine=ENGINE_PYTHON):
+        """(頂点, 面) を返す。numpy エンジンでは (V, 3) / (F, 3) の配列"""
+        if layout['welded']:
+            # 溶着モードは点とタイルが頂点を共有するので、全体を座標で統合する
+            triangles = []
+            self._add_plate_base(triangles, layout)
+            for (cell, x, y), tile in zip(layout['cells'], layout['tiles']):
+                self._add_tile(triangles, cell, tile, x, y, layout)
+            z_base = layout['thickness']
+            glyph_args = self._glyph_args(layout)
+            for cell, x, y in layout['cells']:
+                self._add_braille_char(triangles, cell, x, y, z_base, *glyph_args)
+            vertices, faces = self._index_triangles(triangles)
+            faces = [f[1:] for f in faces]
+            if engine == ENGINE_NUMPY:
+                return np.array(vertices, dtype=np.float64), np.array(faces, dtype=np.int64)
+            return list(vertices), faces
 
-    def _add_plate_with_hole(self, triangles, width, height, depth, corner_radius, hole_cx, hole_cy, hole_r):
-        segments = 32
+        base = []
+        self._add_plate_base(base, layout)
+        base_vertices, base_faces = self._index_triangles(base)
+        glyph_args = self._glyph_args(layout)
+        z_base = layout['thickness']
+
+        if engine == ENGINE_NUMPY:
+            vertex_parts = [np.array(base_vertices, dtype=np.float64)]
+            face_parts = [np.array([f[1:] for f in base_faces], dtype=np.int64)]
+            offset = len(base_vertices)
+            for cell, x, y in layout['cells']:
+                block_vertices, block_faces = self._glyph_indexed_array(cell, *glyph_args)
+                if len(block_faces):
+                    vertex_parts.append(block_vertices + (x, y, z_base))
+                    face_parts.append(block_faces + offset)
+                    offset += len(block_vertices)
+            return np.concatenate(vertex_parts), np.concatenate(face_parts)
+
+        vertices = list(base_vertices)
+        faces = [f[1:] for f in base_faces]
+        for cell, x, y in layout['cells']:
+            block_vertices, block_faces = self._glyph_block(cell, *glyph_args)
+            offset = len(vertices)
+            vertices.extend((x + vx, y + vy, z_base + vz) for vx, vy, vz in block_vertices)
+            faces.extend((offset + i1, offset + i2, offset + i3) for n, i1, i2, i3 in block_faces)
+        return vertices, faces
+
+    def _encode_ply(self, vertices, faces):
+        """バイナリPLY (little endian)"""
+        header = self._ply_header(len(vertices), len(faces))
+        if NUMPY_AVAILABLE and isinstance(vertices, np.ndarray):
+            face_data = np.zeros(len(faces), dtype=PLY_FACE_DTYPE)
+            face_data['count'] = 3
+            face_data['indices'] = faces
+            return header + vertices.astype('<f4').tobytes() + face_data.tobytes()
+
+        pack_vertex = struct.Struct('<3f').pack
+        pack_face = struct.Struct('<B3i').pack
+        data = [header]
+        data.extend(pack_vertex(*v) for v in vertices)
+        data.extend(pack_face(3, *f) for f in faces)
+        return b''.join(data)
+
+    def _ply_header(self, vertex_count, face_count):
+        return (
+            "ply\n"
+            "format binary_little_endian 1.0\n"
+            "comment Tenji P-Fab Generated\n"
+            f"element vertex {vertex_count}\n"
+            "property float x\n"
+            "property float y\n"
+            "property float z\n"
+            f"element face {face_count}\n"
+            "property list uchar int vertex_indices\n"
+            "end_header\n"
+        ).encode('ascii')
+
+    def _encode_3mf(self, vertices, faces):
+        """3MF (3Dモデル XML + 付属ファイルをまとめたZIP)"""
+        # 座標は float32 に丸めてから書く (STL / PLY と同じ精度。有効数字9桁なら float32 に戻しても同じ値)
+        if NUMPY_AVAILABLE and isinstance(vertices, np.ndarray):
+            coords = vertices.astype(np.float32).astype(np.float64).tolist()
+            faces = faces.tolist()
+        else:
+            f32 = struct.Struct('<3f')
+            coords = [f32.unpack(f32.pack(*v)) for v in vertices]
+        vertex_xml = "".join(
+            '<vertex x="%.9g" y="%.9g" z="%.9g"/>' % (x, y, z) for x, y, z in coords)
+        triangle_xml = "".join(
+            f'<triangle v1="{i1}" v2="{i2}" v3="{i3}"/>' for i1, i2, i3 in faces)
+        model = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<model unit="millimeter" xml:lang="en-US" '
+            'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+            '<metadata name="Application">Tenji P-Fab</metadata>'
+            '<resources><object id="1" type="model"><mesh>'
+            f'<vertices>{vertex_xml}</vertices>'
+            f'<triangles>{triangle_xml}</triangles>'
+            '</mesh></object></resources>'
+            '<build><item objectid="1"/></build>'
+            '</model>'
+        )
+        content_types = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+            '</Types>'
+        )
+        rels = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+            'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+            '</Relationships>'
+        )
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as model_zip:
+            for name, text in (("[Content_Types].xml", content_types), ("_rels/.rels", rels), ("3D/3dmodel.model", model)):
+                # 同じメッシュからは常に同じバイト列になるよう日時を固定
+                info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                model_zip.writestr(info, text)
+        return buf.getvalue()
+
+    def _pack_triangles_numpy(self, tris, normals=True):
+        facets = np.zeros(len(tris), dtype=STL_FACET_DTYPE)
+        facets['vertices'] = tris
+        if normals:
+            facets['normal'] = self._facet_normals(tris)
+        return facets.tobytes()
+
+    def _facet_normals(self, tris):
+        """(N, 3, 3) の三角形の単位法線 (N, 3)。面積ゼロの面は 0 (python エンジンと同じ演算順)"""
+        ux, uy, uz = (tris[:, 1] - tris[:, 0]).T
+        vx, vy, vz = (tris[:, 2] - tris[:, 0]).T
+        n = np.empty((3, len(tris)), dtype=np.float64)
+        n[0] = uy * vz - uz * vy
+        n[1] = uz * vx - ux * vz
+        n[2] = ux * vy - uy * vx
+        length = np.sqrt(n[0] * n[0] + n[1] * n[1] + n[2] * n[2])
+        return np.divide(n, length, out=np.zeros_like(n), where=length > 0).T
+
+    def _add_plate_with_hole(self, triangles, width, height, depth, corner_radius, hole_cx, hole_cy, hole_r, segments=PLATE_CORNER_SEGMENTS, hole_segments=TUBE_SEGMENTS, top=True):
+        """
+        穴あきプレート本体
+        上下面は外形と穴 (外形とは独立した分割数) からなる多角形を耳刈りで三角形分割する。
+        三角形数は 上下面 (外形点数 + 穴の点数) x 2 + 側面 (外形点数 + 穴の点数) x 2。
+        """
         outer_points = self._generate_rounded_rect_path(width, height, corner_radius, segments)
+        # 穴の点は補強リング (_add_tube) の内周と同じ角度・同じ計算式で作る
         hole_points = []
+        for i in range(hole_segments):
+            ang = 2 * math.pi * i / hole_segments
+            hole_points.append((hole_cx + hole_r * math.cos(ang), hole_cy + hole_r * math.sin(ang)))
+
+        for p1, p2, p3 in self._triangulate_with_holes(outer_points, [hole_points]):
+            # top=False (溶着モード) では上面は別に作る
+            if top:
+                triangles.append(((0,0,1), (p1[0], p1[1], depth), (p2[0], p2[1], depth), (p3[0], p3[1], depth)))
+            triangles.append(((0,0,-1), (p1[0], p1[1], 0), (p3[0], p3[1], 0), (p2[0], p2[1], 0)))
+
         num_outer = len(outer_points)
-        
-        for px, py in outer_points:
-            vx = px - hole_cx
-            vy = py - hole_cy
-            dist = math.sqrt(vx*vx + vy*vy)
-            if dist == 0: dist = 0.001
-            hx = hole_cx + (vx / dist) * hole_r
-            hy = hole_cy + (vy / dist) * hole_r
-            hole_points.append((hx, hy))
-            
         for i in range(num_outer):
             next_i = (i + 1) % num_outer
             o1 = (outer_points[i][0], outer_points[i][1], depth)
             o2 = (outer_points[next_i][0], outer_points[next_i][1], depth)
-            i2 = (hole_points[next_i][0], hole_points[next_i][1], depth)
-            i1 = (hole_points[i][0], hole_points[i][1], depth)
-            triangles.append(((0,0,1), o1, o2, i1))
-            triangles.append(((0,0,1), i1, o2, i2))
             o1_b = (outer_points[i][0], outer_points[i][1], 0)
             o2_b = (outer_points[next_i][0], outer_points[next_i][1], 0)
-            i2_b = (hole_points[next_i][0], hole_points[next_i][1], 0)
-            i1_b = (hole_points[i][0], hole_points[i][1], 0)
-            triangles.append(((0,0,-1), o1_b, i1_b, o2_b))
-            triangles.append(((0,0,-1), i1_b, i2_b, o2_b))
             triangles.append(((0,0,0), o1_b, o2_b, o2))
             triangles.append(((0,0,0), o1_b, o2, o1))
+
+        for i in range(hole_segments):
+            next_i = (i + 1) % hole_segments
+            i1 = (hole_points[i][0], hole_points[i][1], depth)
+            i2 = (hole_points[next_i][0], hole_points[next_i][1], depth)
+            i1_b = (hole_points[i][0], hole_points[i][1], 0)
+            i2_b = (hole_points[next_i][0], hole_points[next_i][1], 0)
             triangles.append(((0,0,0), i1_b, i1, i2_b))
             triangles.append(((0,0,0), i2_b, i1, i2))
 
+    # --- 多角形の三角形分割 ---
+
+    def _triangulate_with_holes(self, outer, holes):
+        """
+        穴あき多角形を耳刈り法で三角形分割 (反時計回りの三角形 (p1, p2, p3) のリスト)
+        outer: 外形の点列 (反時計回り), holes: 穴の点列のリスト (向きは問わない)
+        穴は外形へ「橋」を架けて1本の多角形にしてから耳を刈る。
+        """
+        polygon = list(outer)
+        if self._signed_area(polygon) < 0:
+            polygon.reverse()
+        pending = []
+        for hole in holes:
+            hole = list(hole)
+            # 穴は時計回りにしてつなぐ
+            if self._signed_area(hole) > 0:
+                hole.reverse()
+            pending.append(hole)
+        # 右端が大きい穴から順につなぐ
+        pending.sort(key=lambda h: max(p[0] for p in h), reverse=True)
+        while pending:
+            hole = pending.pop(0)
+            polygon = self._bridge_hole(polygon, hole, pending)
+        return self._ear_clip(polygon)
+
+    def _signed_area(self, points):
+        area = 0.0
+        n = len(points)
+        for i in range(n):
+            x1, y1 = points[i]
+            x2, y2 = points[(i + 1) % n]
+            area += x1 * y2 - x2 * y1
+        return area / 2
+
+    def _bridge_hole(self, polygon, hole, other_holes):
+        """穴の右端の点と、そこから見える最も近い外側の点を結んで1本の多角形にする"""
+        m_idx = max(range(len(hole)), key=lambda i: (hole[i][0], -hole[i][1]))
+        m = hole[m_idx]
+
+        edges = []
+        for ring in [polygon, hole] + other_holes:
+            n = len(ring)
+            edges.extend((ring[i], ring[(i + 1) % n]) for i in range(n))
+
+        n = len(polygon)
+        # 穴の右端より右にある点を優先 (左側の点への線分はほぼ穴自身を横切る)
+        candidates = sorted(range(n), key=lambda i: (polygon[i][0] < m[0], (polygon[i][0] - m[0]) ** 2 + (polygon[i][1] - m[1]) ** 2))
+        for i in candidates:
+            p = polygon[i]
+            if not self._in_wedge(polygon[i - 1], p, polygon[(i + 1) % n], m):
+                continue
+            if any(self._segments_cross(m, p, a, b) for a, b in edges):
+                continue
+            ring = hole[m_idx:] + hole[:m_idx]
+            return polygon[:i + 1] + ring + [m] + polygon[i:]
+        raise ValueError("Cannot bridge hole into polygon")
+
+    def _in_wedge(self, prev_p, p, next_p, q):
+        """q が頂点 p の内角 (反時計回りの多角形の内側) の方向にあるか"""
+        def cross(o, a, b):
+            return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+        if cross(prev_p, p, next_p) >= 0:
+            # 凸頂点: 両辺の左側
+            return cross(prev_p, p, q) >= 0 and cross(p, next_p, q) >= 0
+        # 凹頂点: どちらかの辺の左側
+        return cross(prev_p, p, q) >= 0 or cross(p, next_p, q) >= 0
+
+    def _segments_cross(self, p1, p2, q1, q2):
+        """線分 p1-p2 と q1-q2 が端点以外で交差するか"""
+        if p1 in (q1, q2) or p2 in (q1, q2):
+            return False
+        def cross(o, a, b):
+            return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+        d1 = cross(q1, q2, p1)
+        d2 = cross(q1, q2, p2)
+        d3 = cross(p1, p2, q1)
+        d4 = cross(p1, p2, q2)
+        if ((d1 > 0 and d2 < 0) or (d1 < 0 and d2 > 0)) and ((d3 > 0 and d4 < 0) or (d3 < 0 and d4 > 0)):
+            return True
+        # 線分上に他方の端点が乗っている場合も交差とみなす
+        def on_segment(a, b, c):
+            return min(a[0], b[0]) <= c[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= c[1] <= max(a[1], b[1])
+        return (d3 == 0 and on_segment(p1, p2, q1)) or (d4 == 0 and on_segment(p1, p2, q2)) or \
+            (d1 == 0 and on_segment(q1, q2, p1)) or (d2 == 0 and on_segment(q1, q2, p2))
+
+    def _ear_clip(self, polygon):
+        """単純多角形 (反時計回り, 橋による重複点あり) を耳刈りで三角形分割"""
+        def cross(o, a, b):
+            return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+        def inside(p, a, b, c):
+            return cross(a, b, p) >= 0 and cross(b, c, p) >= 0 and cross(c, a, p) >= 0
+
+        pts = list(polygon)
+        nxt = list(range(1, len(pts))) + [0]
+        prv = [len(pts) - 1] + list(range(len(pts) - 1))
+        remaining = len(pts)
+        # 凹頂点 (耳の判定で内側に入っていないか調べる対象)
+        reflex = {i for i in range(len(pts)) if cross(pts[prv[i]], pts[i], pts[nxt[i]]) <= 0}
+
+        triangles = []
+        i = 0
+        stall = 0
+        while remaining > 3:
+            a, b, c = prv[i], i, nxt[i]
+            pa, pb, pc = pts[a], pts[b], pts[c]
+            is_ear = cross(pa, pb, pc) > 0
+            if is_ear:
+                for r in reflex:
+                    if r in (a, b, c):
+                        continue
+                    pr = pts[r]
+                    if pr == pa or pr == pb or pr == pc:
+                        continue
+                    if inside(pr, pa, pb, pc):
+                        is_ear = False
+                        break
+            # 一周しても耳が無い場合 (数値誤差・一直線の点) は面積ゼロ以上の頂点を刈る
+            if is_ear or (stall > remaining and cross(pa, pb, pc) >= 0):
+                if cross(pa, pb, pc) > 0:
+                    triangles.append((pa, pb, pc))
+                nxt[a] = c
+                prv[c] = a
+                reflex.discard(b)
+                remaining -= 1
+                for j in (a, c):
+                    if cross(pts[prv[j]], pts[j], pts[nxt[j]]) > 0:
+                        reflex.discard(j)
+                    else:
+                        reflex.add(j)
+                i = a
+                stall = 0
+            else:
+                i = c
+                stall += 1
+                if stall > 2 * remaining + 2:
+                    raise ValueError("Polygon triangulation failed")
+        a, b, c = prv[i], i, nxt[i]
+        if cross(pts[a], pts[b], pts[c]) > 0:
+            triangles.append((pts[a], pts[b], pts[c]))
+        return triangles
+
     def _generate_rounded_rect_path(self, w, h, r, segments_per_corner=8):
         points = []
         cx, cy = w - r, h - r
@@ -241,12 +1467,12 @@ class STLGenerator:
             points.append((cx + r*math.cos(ang), cy + r*math.sin(ang)))
         return points
 
-    def _add_tube(self, triangles, cx, cy, z_base, r_inner, r_outer, height):
-        segments = 32
+    def _add_tube(self, triangles, cx, cy, z_base, r_inner, r_outer, height, segments=TUBE_SEGMENTS):
         top_z = z_base + height
         for i in range(segments):
             ang1 = 2 * math.pi * i / segments
-            ang2 = 2 * math.pi * (i + 1) / segments
+            # 最後の区間は 2π ではなく 0 に戻す (継ぎ目の点を1周目の点と同じ座標にする)
+            ang2 = 2 * math.pi * ((i + 1) % segments) / segments
             idx1 = cx + r_inner * math.cos(ang1); idy1 = cy + r_inner * math.sin(ang1)
             idx2 = cx + r_inner * math.cos(ang2); idy2 = cy + r_inner * math.sin(ang2)
             odx1 = cx + r_outer * math.cos(ang1); ody1 = cy + r_outer * math.sin(ang1)
@@ -262,22 +1488,67 @@ class STLGenerator:
             triangles.append(((0,0,0), b_i1, p_i1, b_i2))
             triangles.append(((0,0,0), b_i2, p_i1, p_i2))
 
-    def _add_braille_char(self, triangles, dots, x, y, z_base, dia, height, px, py):
-        offsets = [
-            (0, 2*py), (0, py), (0, 0),
-            (px, 2*py), (px, py), (px, 0)
-        ]
-        for i, is_on in enumerate(dots):
-            if is_on:
-                dx, dy = offsets[i]
-                cx = x + dx + dia/2
-                cy = y + dy + dia/2
-                self._add_dot_mesh(triangles, cx, cy, z_base, dia/2, height)
-
-    def _add_dot_mesh(self, triangles, cx, cy, cz, r, h):
-        segments = 24
-        rings = 6
-        flat_ratio = 0.5
+    def _add_braille_char(self, triangles, cell, x, y, z_base, dia, height, px, py, segments=DOT_SEGMENTS, rings=DOT_RINGS):
+        vertices, faces = self._glyph_block(cell, dia, height, px, py, segments, rings)
+        pts = [(x + vx, y + vy, z_base + vz) for vx, vy, vz in vertices]
+        for n, i1, i2, i3 in faces:
+            triangles.append((n, pts[i1], pts[i2], pts[i3]))
+
+    def _glyph_block(self, mask, dia, height, px, py, segments=DOT_SEGMENTS, rings=DOT_RINGS):
+        """
+        64通りの点パターン毎に、セル原点基準の (頂点リスト, 面リスト) をキャッシュ
+        点のピッチ・直径・高さ・分割数が変わったらキャッシュ全体を作り直す。
+        """
+        key = (dia, height, px, py, segments, rings)
+        if key != self._glyph_key:
+            self._glyph_key = key
+            self._glyph_blocks = [None] * 64
+            self._glyph_arrays = [None] * 64
+        block = self._glyph_blocks[mask]
+        if block is None:
+            offsets = [
+                (0, 2*py), (0, py), (0, 0),
+                (px, 2*py), (px, py), (px, 0)
+            ]
+            tris = []
+            for i, (dx, dy) in enumerate(offsets):
+                if mask & (1 << i):
+                    self._add_dot_mesh(tris, dx + dia/2, dy + dia/2, 0.0, dia/2, height, segments, rings)
+            block = self._index_triangles(tris)
+            self._glyph_blocks[mask] = block
+        return block
+
+    def _index_triangles(self, tris):
+        """三角形リスト -> (重複のない頂点リスト, (法線, 頂点番号x3) のリスト)"""
+        index = {}
+        faces = []
+        for n, v1, v2, v3 in tris:
+            faces.append((n,) + tuple(index.setdefault(v, len(index)) for v in (v1, v2, v3)))
+        return tuple(index), tuple(faces)
+
+    def _add_dot_mesh(self, triangles, cx, cy, cz, r, h, segments=DOT_SEGMENTS, rings=DOT_RINGS, flat_ratio=0.5):
+        """点1個分のドームを (cx, cy, cz) に配置 (テンプレートを平行移動するだけ)"""
+        vertices, faces = self._dome_template(r, h, segments, rings, flat_ratio)
+        pts = [(cx + vx, cy + vy, cz + vz) for vx, vy, vz in vertices]
+        for n, i1, i2, i3 in faces:
+            triangles.append((n, pts[i1], pts[i2], pts[i3]))
+
+    def _dome_template(self, r, h, segments=DOT_SEGMENTS, rings=DOT_RINGS, flat_ratio=0.5):
+        """
+        原点に置いたドームを (頂点リスト, 面の頂点番号リスト) としてキャッシュから取得
+        配置時は頂点に中心座標を足すだけなので、三角関数の計算はキー毎に1回で済む。
+        """
+        key = (r, h, segments, rings, flat_ratio)
+        template = self._dome_templates.get(key)
+        if template is None:
+            tris = []
+            self._build_dome(tris, r, h, segments, rings, flat_ratio)
+            template = self._index_triangles(tris)
+            self._dome_templates[key] = template
+        return template
+
+    def _build_dome(self, triangles, r, h, segments, rings, flat_ratio):
+        cx = cy = cz = 0.0
         theta_limit = (math.pi / 2) * flat_ratio
         sin_limit = math.sin(theta_limit)
         z_scale = 1.0 / sin_limit
@@ -343,18 +1614,16 @@ class STLGenerator:
         for info in pages_info:
             page_num = info['page_num']
             plate_lines = info['plate_lines']
-            page_dots = info['page_dots']
-            page_braille_str = "".join([self._dots_to_unicode(d) for d in page_dots])
+            page_braille_str = "".join([self._cell_to_unicode(cell) for cell in info['page_cells']])
 
             rows += f"<div class='plate-block'><h2>Plate {page_num:02d} <span class='page-braille'>({page_braille_str})</span></h2>"
             rows += "<table border='1' cellspacing='0' cellpadding='5' style='border-collapse: collapse; width: 100%;'>"
             rows += "<tr style='background-color: #f0f0f0;'><th>Line</th><th>Content</th></tr>"
             
-            for line_idx, line_cells in enumerate(plate_lines):
+            for line_idx, line in enumerate(plate_lines):
                 line_content_html = ""
-                for cell in line_cells:
-                    char = cell['char']
-                    uni_char = self._dots_to_unicode(cell['dots'])
+                for cell, char in zip(line.cells, line.chars):
+                    uni_char = self._cell_to_unicode(cell)
                     line_content_html += f"<div style='display:inline-block; text-align:center; margin:2px; border:1px solid #eee; padding:2px;'><div style='font-size:20px;'>{uni_char}</div><div style='font-size:12px;'>{char}</div></div>"
                 
                 rows += f"<tr><td align='center' width='50'>L{line_idx+1}</td><td>{line_content_html}</td></tr>"
@@ -376,12 +1645,6 @@ class STLGenerator:
         </body></html>
         """
 
-    def _dots_to_unicode(self, dots):
-        code = 0x2800
-        if dots[0]: code += 0x01
-        if dots[1]: code += 0x02
-        if dots[2]: code += 0x04
-        if dots[3]: code += 0x08
-        if dots[4]: code += 0x10
-        if dots[5]: code += 0x20
-        return chr(code)
+    def _cell_to_unicode(self, cell):
+        # Unicode点字 (U+2800-) のビット割り当てはセルの整数と同じ
+        return chr(0x2800 + cell)
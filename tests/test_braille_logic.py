@@ -0,0 +1,117 @@
+"""braille_logic の差分変換の回帰テスト"""
+import pytest
+
+from braille_logic import BrailleConverter, ConversionWorker, cells_to_legacy, mapped_data_from_legacy
+
+TEXT = "今日は 晴れ。\n明日も 晴れ。"
+
+# 以前の版が履歴に保存した変換結果: Janome が飛ばした空白・改行は単語に含まれず、
+# start / end は単語の長さを足していっただけなので本文の位置とずれる。読みは手で直したもの
+LEGACY_WORDS = [("今日", "きょう"), ("は", "わ"), ("晴れ", "はれ"), ("。", "。"),
+                ("明日", "あした"), ("も", "も"), ("晴れ", "はれ"), ("。", "。")]
+
+
+@pytest.fixture
+def converter():
+    return BrailleConverter()
+
+
+class StripTokenizer:
+    """Janome と同じく前後の空白を取り除き、1文字ずつ (読みは表層形のまま) 返す"""
+
+    class Token:
+        def __init__(self, surface):
+            self.surface = surface
+            self.reading = '*'
+
+    def tokenize(self, text):
+        return [self.Token(char) for char in text.strip()]
+
+
+@pytest.fixture
+def tokenized_converter(converter):
+    converter.tokenizer = StripTokenizer()
+    converter.use_kakasi = True
+    return converter
+
+
+def cell_words(mapped_data):
+    return [(item['orig'], item['cells']) for item in mapped_data if item['cells']]
+
+
+def legacy_mapped_data(converter):
+    legacy = []
+    pos = 0
+    for orig, reading in LEGACY_WORDS:
+        cells = cells_to_legacy(*converter.kana_to_cells(reading))
+        legacy.append({'orig': orig, 'reading': reading, 'braille': [c['dots'] for c in cells], 'cells': cells,
+                       'start': pos, 'end': pos + len(orig)})
+        pos += len(orig)
+    return legacy
+
+
+def test_normalize_legacy_mapped_data_covers_the_text(converter):
+    mapped_data = converter.normalize_mapped_data(TEXT, mapped_data_from_legacy(legacy_mapped_data(converter)))
+
+    assert mapped_data[0]['start'] == 0
+    assert mapped_data[-1]['end'] == len(TEXT)
+    assert all(a['end'] == b['start'] for a, b in zip(mapped_data, mapped_data[1:]))
+    assert all(TEXT[item['start']:item['end']] == item['orig'] for item in mapped_data)
+    assert [item['reading'] for item in mapped_data if not item['orig'].isspace()] == [r for o, r in LEGACY_WORDS]
+
+
+def test_edit_after_restoring_legacy_data_keeps_manual_readings(converter):
+    restored = converter.normalize_mapped_data(TEXT, mapped_data_from_legacy(legacy_mapped_data(converter)))
+    edited = TEXT.replace("明日", "明後日")
+
+    mapped_data = converter.convert_incremental(TEXT, edited, restored)
+
+    assert "".join(item['orig'] for item in mapped_data) == edited
+    # 変わっていない1文目の手で直した読みは残る
+    first = [item['reading'] for item in mapped_data if item['end'] <= TEXT.index("\n")]
+    assert first == ["きょう", "わ", " ", "はれ", "。"]
+
+
+def test_normalize_keeps_mapped_data_that_does_not_match_the_text(converter):
+    mapped_data = mapped_data_from_legacy(legacy_mapped_data(converter))
+
+    assert converter.normalize_mapped_data("別の文章", mapped_data) is mapped_data
+
+
+def test_conversion_worker_wait_flushes_the_debounced_input(converter):
+    results = []
+    worker = ConversionWorker(converter, lambda generation, text, mapped_data: results.append(text), debounce=60)
+    try:
+        # 入力待ち (debounce) の依頼を、保存の前に直ちに変換し直して待つ
+        worker.submit("てんじ")
+        generation = worker.submit("てんじの", immediate=True)
+        assert worker.wait(generation, timeout=5)
+        assert results == ["てんじの"]
+
+        # 捨てた依頼を待っても終わる
+        generation = worker.submit("てん")
+        worker.cancel()
+        assert worker.wait(generation, timeout=5)
+        assert results == ["てんじの"]
+    finally:
+        worker.close()
+
+
+@pytest.mark.parametrize('text', ["てんじ\n", "  てんじ", "\nてんじ。\nかな\n\n", "てん じ\n"])
+def test_whitespace_at_document_edges_has_no_cells(tokenized_converter, text):
+    mapped_data = tokenized_converter.convert_with_mapping(text)
+
+    # 空白の単語を入れる前の変換 (トークンだけ) と同じセル
+    tokens = tokenized_converter.tokenizer.tokenize(text)
+    assert cell_words(mapped_data) == [(t.surface, tokenized_converter.kana_to_cells(t.surface)[0]) for t in tokens]
+    assert "".join(item['orig'] for item in mapped_data) == text
+
+
+def test_incremental_keeps_cells_for_newlines_inside_the_document(tokenized_converter):
+    old_text = "てんじ\nかな\nおわり\n"
+    new_text = "てんじ\nかなを\nおわり\n"
+    old_mapped_data = tokenized_converter.convert_with_mapping(old_text)
+
+    mapped_data = tokenized_converter.convert_incremental(old_text, new_text, old_mapped_data)
+
+    assert cell_words(mapped_data) == cell_words(tokenized_converter.convert_with_mapping(new_text))
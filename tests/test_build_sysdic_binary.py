@@ -0,0 +1,66 @@
+"""build_sysdic_binary.py を小さな sysdic で実行し、3つのバイナリファイルを読み込めることを確認する"""
+import os
+import sys
+
+import build_sysdic_binary
+from janome.dat import DoubleArrayMatcher
+from janome.dic import (
+    ConnectionMatrix, EntryStore, FILE_CONNECTIONS, FILE_DOUBLE_ARRAY, FILE_ENTRIES,
+    end_save_entries, save_connections, save_entry, save_entry_buckets, start_save_entries,
+)
+
+CONNECTIONS = [[0, -5, 7], [12, 3, -300], [4000, -4000, 1]]
+
+# (表層形, left_id, right_id, cost, 品詞, 活用型, 活用形, 原形, 読み, 発音)
+ENTRIES = [
+    ('東京', 1, 1, 100, '名詞,固有名詞,地域,一般', '*', '*', '東京', 'トウキョウ', 'トーキョー'),
+    ('東', 1, 2, 50, '名詞,一般,*,*', '*', '*', '東', 'ヒガシ', 'ヒガシ'),
+    ('東', 2, 2, 70, '名詞,固有名詞,人名,姓', '*', '*', '東', 'アズマ', 'アズマ'),
+    ('京都', 1, 1, 80, '名詞,固有名詞,地域,一般', '*', '*', '京都', 'キョウト', 'キョート'),
+    ('点字', 2, 1, 60, '名詞,一般,*,*', '*', '*', '点字', 'テンジ', 'テンジ'),
+]
+BUCKETS = {0: (0, 3), 1: (3, 5)}
+
+
+def make_sysdic(sysdic_dir):
+    """janome の書き出し関数で、ビルド時と同じ形式の sysdic モジュールを作る"""
+    save_connections(CONNECTIONS, sysdic_dir)
+    save_entry_buckets(sysdic_dir, BUCKETS)
+    for bucket_idx, (start, end) in BUCKETS.items():
+        start_save_entries(sysdic_dir, bucket_idx, start)
+        for morph_id in range(start, end):
+            save_entry(sysdic_dir, bucket_idx, morph_id, ENTRIES[morph_id])
+        end_save_entries(sysdic_dir, bucket_idx)
+
+
+def test_main_writes_all_binary_files(tmp_path, monkeypatch):
+    sysdic_dir = str(tmp_path)
+    make_sysdic(sysdic_dir)
+    monkeypatch.setattr(sys, "argv", ["build_sysdic_binary.py", sysdic_dir])
+
+    build_sysdic_binary.main()
+
+    connections = ConnectionMatrix.load(os.path.join(sysdic_dir, FILE_CONNECTIONS))
+    assert [[connections.get(i, j) for j in range(3)] for i in range(3)] == CONNECTIONS
+
+    store = EntryStore.load(os.path.join(sysdic_dir, FILE_ENTRIES))
+    for morph_id, entry in enumerate(ENTRIES):
+        assert store.entry(morph_id) == entry[:4]
+        assert store.extra(morph_id) == entry[4:]
+
+    matcher = DoubleArrayMatcher.load(os.path.join(sysdic_dir, FILE_DOUBLE_ARRAY))
+    assert matcher.morph_ids('東京都'.encode('utf-8')) == [1, 2, 0]
+    assert matcher.morph_ids('京都'.encode('utf-8')) == [3]
+    assert matcher.morph_ids('点字'.encode('utf-8')) == [4]
+    assert matcher.morph_ids('大阪'.encode('utf-8')) == []
+
+
+def test_main_can_run_twice(tmp_path, monkeypatch):
+    # モジュールを sys.modules に残さないので、同じプロセスで別の sysdic を変換しても読み直される
+    for name in ("a", "b"):
+        sysdic_dir = str(tmp_path / name)
+        os.mkdir(sysdic_dir)
+        make_sysdic(sysdic_dir)
+        monkeypatch.setattr(sys, "argv", ["build_sysdic_binary.py", sysdic_dir])
+        build_sysdic_binary.main()
+        assert os.path.exists(os.path.join(sysdic_dir, FILE_DOUBLE_ARRAY))
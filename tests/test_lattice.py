@@ -0,0 +1,81 @@
+"""ArrayLattice の最小コスト経路が Lattice と同じになることを、小さな辞書でランダムに確認する"""
+import random
+
+import pytest
+
+from janome import lattice as lattice_module
+from janome.dic import RAMDictionary
+from janome.lattice import NUMPY_AVAILABLE, ArrayLattice, Lattice, Node, SurfaceNode
+
+pytestmark = pytest.mark.skipif(not NUMPY_AVAILABLE, reason="ArrayLattice requires numpy")
+
+# 連接コストと単語コストの幅を狭くして、同じコストの経路 (num での決着) を多くする
+NUM_IDS = 4
+CHARS = "ab"
+CASES = 300
+
+
+def make_dictionary(rng):
+    """(表層形 -> 単語) と、連接コスト表だけを持つ辞書"""
+    connections = [[rng.randint(-2, 2) for _ in range(NUM_IDS)] for _ in range(NUM_IDS)]
+    words = {}
+    num = 0
+    for surface in ["a", "b", "aa", "ab", "ba", "bb", "aab", "bba"]:
+        # 1文字の単語は多くして、位置毎の (終わる単語 x 始まる単語) が ARRAY_MIN_PAIRS を超えるようにする
+        for _ in range(rng.randint(10, 14) if len(surface) == 1 else rng.randint(0, 4)):
+            words.setdefault(surface, []).append(
+                (num, rng.randrange(NUM_IDS), rng.randrange(NUM_IDS), rng.randint(0, 3), rng.random() < 0.3))
+            num += 1
+    return RAMDictionary({}, connections), words
+
+
+def make_node(word):
+    num, surface, left_id, right_id, cost, user_dict = word
+    if user_dict:
+        # ユーザー辞書の単語 (Node) は num を持たないので、同じコストでも num では選ばれない
+        return Node((surface, left_id, right_id, cost, '名詞,一般,*,*', '*', '*', surface, '*', '*'))
+    return SurfaceNode((num, surface, left_id, right_id, cost))
+
+
+def best_path(lattice_class, dic, words, text):
+    """Tokenizer と同じ順に単語を足して最小コスト経路を求める"""
+    lattice = lattice_class(len(text), dic)
+    pos = 0
+    while pos < len(text):
+        for surface, entries in words.items():
+            if text.startswith(surface, pos):
+                for num, left_id, right_id, cost, user_dict in entries:
+                    lattice.add(make_node((num, surface, left_id, right_id, cost, user_dict)))
+        pos += lattice.forward()
+    lattice.end()
+    return [(type(node).__name__, node.pos, node.index, node.min_cost, node.back_pos, node.back_index)
+            for node in lattice.backward()]
+
+
+@pytest.fixture
+def array_calls(monkeypatch):
+    """NumPy でまとめて計算した位置の数"""
+    calls = []
+    resolve_array = ArrayLattice._resolve_array
+
+    def counting(self, enodes, min_costs, nodes):
+        calls.append(len(enodes) * len(nodes))
+        return resolve_array(self, enodes, min_costs, nodes)
+    monkeypatch.setattr(ArrayLattice, "_resolve_array", counting)
+    return calls
+
+
+@pytest.mark.parametrize("min_pairs", [lattice_module.ARRAY_MIN_PAIRS, 1, 10 ** 9])
+def test_array_lattice_matches_lattice(monkeypatch, array_calls, min_pairs):
+    monkeypatch.setattr(lattice_module, "ARRAY_MIN_PAIRS", min_pairs)
+    rng = random.Random(min_pairs)
+    for _ in range(CASES):
+        dic, words = make_dictionary(rng)
+        text = "".join(rng.choice(CHARS) for _ in range(rng.randint(1, 12)))
+        assert best_path(ArrayLattice, dic, words, text) == best_path(Lattice, dic, words, text), text
+
+    if min_pairs == 10 ** 9:
+        assert not array_calls
+    else:
+        # 既定のしきい値でも、NumPy の経路を通る位置がある
+        assert array_calls and min(array_calls) >= min_pairs
@@ -0,0 +1,173 @@
+"""stl_generator のメッシュの回帰テスト"""
+import io
+import math
+import os
+import re
+import struct
+import zipfile
+
+import pytest
+
+from braille_logic import CellLine
+from stl_generator import (
+    FORMAT_3MF, FORMAT_PLY, QUALITY_DRAFT, QUALITY_FINE, QUALITY_NORMAL, STL_FACET, STL_HEADER, PlateCache, STLGenerator,
+    validate_stl,
+)
+
+# 穴あきプレート本体 (_add_plate_with_hole) の寸法
+PLATE = dict(width=70.0, height=30.0, depth=1.0, corner_radius=3.0, hole_cx=6.0, hole_cy=24.0, hole_r=2.0)
+
+# 耳刈り版の出力 (外形 132 点 + 穴 32 点)
+PLATE_TRIANGLES = 656
+PLATE_VOLUME = 2079.7771981315
+
+# 以前の出力 (穴の点を外形の点から放射状に作り、外形と帯状につないでいた版)
+PREVIOUS_PLATE_TRIANGLES = 1056
+PREVIOUS_PLATE_VOLUME = 2083.9672151246
+
+# 溶着モードのプレート (2行 + ページ番号, 点は27個)
+WELDED_BODY = [bytes([1, 3, 9, 27, 63, 0, 5]), bytes([8, 16, 32, 12])]
+WELDED_PAGE = 3
+WELDED_TRIANGLES = 10376
+WELDED_VOLUME = 1980.2457541661
+
+
+def to_stl(triangles):
+    return STL_HEADER + struct.pack('<I', len(triangles)) + b''.join(
+        STL_FACET.pack(0.0, 0.0, 0.0, *a, *b, *c, 0) for normal, a, b, c in triangles)
+
+
+def polygon_area(points):
+    return abs(sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]))) / 2
+
+
+@pytest.fixture
+def generator():
+    return STLGenerator(cache_max_bytes=0)
+
+
+def test_plate_with_hole_is_closed_and_matches_baseline(generator):
+    triangles = []
+    generator._add_plate_with_hole(triangles, **PLATE)
+    report = validate_stl(to_stl(triangles))
+
+    assert report['watertight']
+    assert report['faces'] == PLATE_TRIANGLES
+    assert report['volume'] == pytest.approx(PLATE_VOLUME, rel=1e-6)
+
+    # 体積 = (外形の面積 - 穴の多角形の面積) x 厚さ
+    outer = generator._generate_rounded_rect_path(PLATE['width'], PLATE['height'], PLATE['corner_radius'], 32)
+    hole = [(PLATE['hole_cx'] + PLATE['hole_r'] * math.cos(2 * math.pi * i / 32),
+             PLATE['hole_cy'] + PLATE['hole_r'] * math.sin(2 * math.pi * i / 32)) for i in range(32)]
+    assert report['volume'] == pytest.approx((polygon_area(outer) - polygon_area(hole)) * PLATE['depth'], rel=1e-6)
+
+
+def test_plate_with_hole_differs_from_previous_only_by_hole_shape(generator):
+    outer = generator._generate_rounded_rect_path(PLATE['width'], PLATE['height'], PLATE['corner_radius'], 32)
+    # 以前の穴: 外形の各点を穴の中心へ向けて半径上に射影した点
+    previous_hole = []
+    for px, py in outer:
+        vx, vy = px - PLATE['hole_cx'], py - PLATE['hole_cy']
+        dist = math.hypot(vx, vy)
+        previous_hole.append((PLATE['hole_cx'] + vx / dist * PLATE['hole_r'],
+                              PLATE['hole_cy'] + vy / dist * PLATE['hole_r']))
+    previous_volume = (polygon_area(outer) - polygon_area(previous_hole)) * PLATE['depth']
+    assert previous_volume == pytest.approx(PREVIOUS_PLATE_VOLUME, rel=1e-6)
+    # 外形の分割は同じで、穴は外形と独立した32分割になった分だけ三角形が減る
+    assert PREVIOUS_PLATE_TRIANGLES == 8 * len(outer)
+    assert PLATE_TRIANGLES == 4 * (len(outer) + 32)
+
+
+def test_triangulate_with_many_holes_covers_the_area(generator):
+    outer = [(0.0, 0.0), (40.0, 0.0), (40.0, 20.0), (0.0, 20.0)]
+    holes = []
+    for i in range(6):
+        for j in range(3):
+            x, y = 2.0 + i * 6.0, 2.0 + j * 6.0
+            holes.append([(x, y), (x + 4.0, y), (x + 4.0, y + 4.0), (x, y + 4.0)])
+    triangles = generator._triangulate_with_holes(outer, holes)
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    assert all(cross(a, b, c) > 0 for a, b, c in triangles)
+    assert sum(cross(a, b, c) / 2 for a, b, c in triangles) == pytest.approx(40 * 20 - 18 * 16)
+    # 点数 n, 穴 h 個の多角形は n + 2h - 2 個の三角形になる
+    assert len(triangles) == 4 + 18 * 4 + 2 * 18 - 2
+
+
+def test_welded_plate_is_closed_and_matches_baseline(generator):
+    page_cells = generator._page_number_cells(WELDED_PAGE)
+    report = validate_stl(bytes(generator._create_plate_stl(WELDED_BODY, page_cells, 1.0, welded=True)))
+
+    assert report['watertight']
+    assert report['faces'] == WELDED_TRIANGLES
+    assert report['volume'] == pytest.approx(WELDED_VOLUME, rel=1e-6)
+
+
+@pytest.mark.parametrize('quality', [QUALITY_DRAFT, QUALITY_NORMAL, QUALITY_FINE])
+@pytest.mark.parametrize('body, page', [
+    (WELDED_BODY, WELDED_PAGE),
+    ([bytes([63] * 12), bytes(), bytes([7, 56])], 128),
+    ([bytes([1])], 1),
+])
+def test_welded_triangle_count_matches_generated_faces(generator, monkeypatch, quality, body, page):
+    tessellation = generator._tessellation(quality)
+    page_cells = generator._page_number_cells(page)
+    layout = generator._layout_plate(body, page_cells, 1.0, tessellation, welded=True)
+
+    # 数えるだけなら三角形分割もタイルの型も作らない
+    def fail(*args, **kwargs):
+        raise AssertionError('geometry built while counting')
+    with monkeypatch.context() as m:
+        m.setattr(generator, '_triangulate_with_holes', fail)
+        m.setattr(generator, '_tile_pattern', fail)
+        count = generator._count_plate_triangles(layout)
+
+    data = bytes(generator._create_plate_stl(body, page_cells, 1.0, tessellation=tessellation, welded=True))
+    assert count == struct.unpack_from('<I', data, 80)[0]
+
+
+@pytest.mark.parametrize('disk', [False, True])
+def test_streaming_export_is_cached_only_with_a_disk_tier(tmp_path, disk):
+    generator = STLGenerator(cache_dir=str(tmp_path / 'cache') if disk else None)
+    plates = [[CellLine(body, tuple(' ' * len(body))) for body in WELDED_BODY]]
+
+    for name in ('first.zip', 'second.zip'):
+        generator.generate_package_from_plates(plates, str(tmp_path / name), streaming=True)
+    assert generator.last_export_info['regenerated_pages'] == ([] if disk else [1])
+
+    # メモリのキャッシュにあるプレートは streaming でも使う
+    generator.generate_package_from_plates(plates, str(tmp_path / 'third.zip'))
+    generator.generate_package_from_plates(plates, str(tmp_path / 'fourth.zip'), streaming=True)
+    assert generator.last_export_info['regenerated_pages'] == []
+
+
+def test_3mf_vertices_match_ply_float32(generator):
+    page_cells = generator._page_number_cells(WELDED_PAGE)
+    ply = generator._create_plate_file(WELDED_BODY, page_cells, 1.0, export_format=FORMAT_PLY, welded=True)
+    threemf = generator._create_plate_file(WELDED_BODY, page_cells, 1.0, export_format=FORMAT_3MF, welded=True)
+
+    header_end = ply.index(b'end_header\n') + len(b'end_header\n')
+    vertex_count = int(re.search(rb'element vertex (\d+)', ply).group(1))
+    ply_vertices = list(struct.iter_unpack('<3f', ply[header_end:header_end + 12 * vertex_count]))
+    with zipfile.ZipFile(io.BytesIO(threemf)) as z:
+        model = z.read('3D/3dmodel.model').decode('utf-8')
+    # 3MF の座標を float32 にすると PLY の頂点と一致する
+    threemf_vertices = [struct.unpack('<3f', struct.pack('<3f', *map(float, v)))
+                        for v in re.findall(r'<vertex x="([^"]+)" y="([^"]+)" z="([^"]+)"/>', model)]
+    assert threemf_vertices == ply_vertices
+
+
+def test_disk_cache_evicts_least_recently_used_files(tmp_path):
+    cache = PlateCache(max_bytes=0, cache_dir=str(tmp_path), disk_max_bytes=250)
+    cache.put('a', b'a' * 100)
+    cache.put('b', b'b' * 100)
+    os.utime(tmp_path / 'a.bin', (1, 1))
+    os.utime(tmp_path / 'b.bin', (2, 2))
+
+    # 読んだファイルは新しくなるので、上限を超えたら b が消える
+    assert cache.get('a') == b'a' * 100
+    cache.put('c', b'c' * 100)
+    assert sorted(os.listdir(tmp_path)) == ['a.bin', 'c.bin']
+    assert cache.get('b') is None